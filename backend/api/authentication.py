@@ -0,0 +1,73 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from api.cache import LRUCache, is_cross_process_cache
+from users.models import User
+
+
+class TokenCache:
+    def __init__(self):
+        self.local = LRUCache(
+            settings.TOKEN_CACHE_LOCAL_SIZE,
+            settings.TOKEN_CACHE_LOCAL_TTL
+        )
+
+    @staticmethod
+    def shared_key(key):
+        return f'token:{hashlib.sha256(key.encode()).hexdigest()}'
+
+    @staticmethod
+    def snapshot(user):
+        return {
+            field.attname: getattr(user, field.attname)
+            for field in User._meta.concrete_fields
+            if field.name not in User.counter_fields
+            and field.name != 'password'
+        }
+
+    def get(self, key):
+        snapshot = self.local.get(key)
+        if snapshot is None:
+            if not is_cross_process_cache():
+                return None
+            snapshot = cache.get(self.shared_key(key))
+            if snapshot is None:
+                return None
+            self.local.set(key, snapshot)
+        return User.from_db(
+            DEFAULT_DB_ALIAS, list(snapshot), list(snapshot.values()))
+
+    def set(self, key, user):
+        snapshot = self.snapshot(user)
+        if is_cross_process_cache():
+            cache.set(
+                self.shared_key(key), snapshot, settings.TOKEN_CACHE_TIMEOUT)
+        self.local.set(key, snapshot)
+
+    def invalidate(self, *keys):
+        if is_cross_process_cache():
+            cache.delete_many([self.shared_key(key) for key in keys])
+        for key in keys:
+            self.local.delete(key)
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        user = token_cache.get(key)
+        if user is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, user)
+            return user, token
+        if not user.is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        return user, Token(key=key, user=user)
@@ -0,0 +1,77 @@
+import bisect
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from api.cache import ingredients_cache
+from recipes.models import Ingredient
+
+FIELDS = ('id', 'name', 'measurement_unit')
+SUBSTRING_MIN_LENGTH = 3
+
+
+class PostgresIngredientSearch:
+    def search(self, name):
+        prefix_matches = list(Ingredient.objects.filter(
+            name__istartswith=name
+        ).order_by('name', 'id').values(*FIELDS))
+        if len(name) < SUBSTRING_MIN_LENGTH:
+            return prefix_matches
+        return prefix_matches + list(Ingredient.objects.filter(
+            name__icontains=name
+        ).exclude(
+            name__istartswith=name
+        ).order_by('name', 'id').values(*FIELDS))
+
+
+class InMemoryIngredientSearch:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked = None
+        self._keys = []
+        self._rows = []
+
+    def load(self):
+        checked = self._checked
+        if (checked is not None and time.monotonic() - checked
+                < settings.REFERENCE_CACHE_LOCAL_TTL):
+            return
+        version = ingredients_cache.version()[0]
+        with self._lock:
+            if version != self._version:
+                rows = sorted(
+                    ((row['name'].casefold(), row)
+                     for row in Ingredient.objects.values(*FIELDS).iterator()),
+                    key=lambda item: (item[0], item[1]['id'])
+                )
+                self._keys = [key for key, _ in rows]
+                self._rows = [row for _, row in rows]
+                self._version = version
+            self._checked = time.monotonic()
+
+    def search(self, name):
+        self.load()
+        keys, rows = self._keys, self._rows
+        name = name.casefold()
+        start = bisect.bisect_left(keys, name)
+        end = bisect.bisect_left(keys, name + chr(0x10ffff), start)
+        if len(name) < SUBSTRING_MIN_LENGTH:
+            return rows[start:end]
+        substring_matches = [
+            row for index, (key, row) in enumerate(zip(keys, rows))
+            if not start <= index < end and name in key
+        ]
+        return rows[start:end] + substring_matches
+
+
+_in_memory_search = InMemoryIngredientSearch()
+_postgres_search = PostgresIngredientSearch()
+
+
+def search_ingredients(name):
+    if connection.vendor == 'postgresql':
+        return _postgres_search.search(name)
+    return _in_memory_search.search(name)
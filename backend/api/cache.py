@@ -0,0 +1,112 @@
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import Count, Max
+
+from recipes.models import Ingredient, Tag
+
+CacheEntry = namedtuple('CacheEntry', ('data', 'etag', 'last_modified'))
+
+
+def is_cross_process_cache(alias='default'):
+    return not isinstance(caches[alias], (LocMemCache, DummyCache))
+
+
+class LRUCache:
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = (value, time.monotonic() + self.ttl)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class ReferenceCache:
+    def __init__(self, namespace, model):
+        self.namespace = namespace
+        self.model = model
+        self.local = LRUCache(
+            settings.REFERENCE_CACHE_LOCAL_SIZE,
+            settings.REFERENCE_CACHE_LOCAL_TTL
+        )
+
+    @property
+    def version_key(self):
+        return f'reference:{self.namespace}:version'
+
+    def fingerprint(self):
+        state = self.model.objects.aggregate(
+            last_id=Max('pk'), count=Count('pk'),
+            updated_at=Max('updated_at'))
+        return state['last_id'], state['count'], state['updated_at']
+
+    def version(self):
+        fingerprint = self.fingerprint()
+        state = cache.get(self.version_key)
+        if state is None or state[1] != fingerprint:
+            state = (uuid.uuid4().hex, fingerprint, time.time())
+            cache.set(self.version_key, state, None)
+        version, _, last_modified = state
+        return version, last_modified
+
+    def invalidate(self):
+        cache.delete(self.version_key)
+        self.local.clear()
+
+    def get_or_set(self, key, builder):
+        entry = self.local.get(key)
+        if entry is not None:
+            return entry
+        version, last_modified = self.version()
+        digest = hashlib.md5(key.encode()).hexdigest()
+        shared_key = f'reference:{self.namespace}:{version}:{digest}'
+        data = cache.get(shared_key)
+        if data is None:
+            data = builder()
+            cache.set(shared_key, data, settings.REFERENCE_CACHE_TIMEOUT)
+        entry = CacheEntry(
+            data, f'"{self.namespace}-{version}-{digest}"', last_modified)
+        self.local.set(key, entry)
+        return entry
+
+
+tags_cache = ReferenceCache('tags', Tag)
+ingredients_cache = ReferenceCache('ingredients', Ingredient)
+
+
+def tag_ids_by_slug():
+    return tags_cache.get_or_set(
+        'slugs', lambda: dict(Tag.objects.values_list('slug', 'id'))).data
@@ -0,0 +1,79 @@
+import binascii
+import re
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from PIL import Image
+from rest_framework import serializers
+
+BASE64_HEADER = re.compile(r'^data:[\w/+.-]*;base64,')
+WHITESPACE = re.compile(r'\s+')
+IMAGE_EXTENSIONS = {'JPEG': 'jpg'}
+
+
+class RecipeImageField(serializers.ImageField):
+    default_error_messages = {
+        'invalid_base64': 'Некорректное изображение в base64.',
+    }
+
+    def __init__(self, rendition=None, detail_rendition=None, **kwargs):
+        self.rendition = rendition
+        self.detail_rendition = detail_rendition or rendition
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            data = self.decode(data)
+        return super().to_internal_value(data)
+
+    def decode(self, data):
+        header = BASE64_HEADER.match(data)
+        chunk_size = settings.BASE64_DECODE_CHUNK_SIZE
+        upload = TemporaryUploadedFile('image', None, 0, None)
+        carry = ''
+        try:
+            for start in range(header.end() if header else 0, len(data),
+                               chunk_size):
+                chunk = carry + WHITESPACE.sub(
+                    '', data[start:start + chunk_size])
+                usable = len(chunk) - len(chunk) % 4
+                upload.write(binascii.a2b_base64(chunk[:usable]))
+                carry = chunk[usable:]
+            if carry:
+                raise binascii.Error
+            upload.size = upload.tell()
+            upload.seek(0)
+            image_format = Image.open(upload).format
+        except binascii.Error:
+            upload.close()
+            self.fail('invalid_base64')
+        except Exception:
+            upload.close()
+            self.fail('invalid_image')
+        upload.seek(0)
+        upload.name = '{}.{}'.format(
+            uuid.uuid4().hex,
+            IMAGE_EXTENSIONS.get(image_format, image_format.lower())
+        )
+        upload.content_type = Image.MIME.get(image_format)
+        return upload
+
+    def get_rendition(self):
+        view = self.context.get('view')
+        if getattr(view, 'detail', False):
+            return self.detail_rendition
+        return self.rendition
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        rendition = self.get_rendition()
+        renditions = getattr(value.instance, 'renditions', None) or {}
+        if renditions.get('source') == value.name and rendition in renditions:
+            url = default_storage.url(renditions[rendition])
+        else:
+            url = value.url
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
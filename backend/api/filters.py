@@ -1,15 +1,37 @@
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import FilterSet, filters
-from rest_framework.filters import SearchFilter
 
-from recipes.models import Recipe, Tag
+from recipes.models import Recipe
+
+from .cache import tag_ids_by_slug
+from .search import search_recipes
+
+TAGS_MODE_ANY = 'any'
+TAGS_MODE_ALL = 'all'
+RecipeTag = Recipe.tags.through
+
+
+def tag_choices():
+    return [(slug, slug) for slug in tag_ids_by_slug()]
+
+
+def has_tags(tag_ids):
+    return Exists(RecipeTag.objects.filter(
+        recipe_id=OuterRef('pk'), tag_id__in=tag_ids))
 
 
 class RecipeFilter(FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all(),
+    tags = filters.MultipleChoiceFilter(
+        choices=tag_choices,
+        method='filter_tags'
     )
+    tags_mode = filters.ChoiceFilter(
+        choices=((TAGS_MODE_ANY, TAGS_MODE_ANY),
+                 (TAGS_MODE_ALL, TAGS_MODE_ALL)),
+        method='filter_tags_mode'
+    )
+
+    search = filters.CharFilter(method='filter_search')
 
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
@@ -17,7 +39,27 @@ class RecipeFilter(FilterSet):
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author',)
+        fields = ('tags', 'tags_mode', 'author',)
+
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        ids_by_slug = tag_ids_by_slug()
+        tag_ids = sorted({ids_by_slug.get(slug, 0) for slug in value})
+        if self.form.cleaned_data.get('tags_mode') != TAGS_MODE_ALL:
+            return queryset.filter(has_tags(tag_ids))
+        for tag_id in tag_ids:
+            queryset = queryset.filter(has_tags([tag_id]))
+        return queryset
+
+    def filter_tags_mode(self, queryset, name, value):
+        return queryset
+
+    def filter_search(self, queryset, name, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        return search_recipes(queryset, value)
 
     def filter_is_favorited(self, queryset, name, value):
         user = self.request.user
@@ -30,7 +72,3 @@ class RecipeFilter(FilterSet):
         if value and user.is_authenticated:
             return queryset.filter(shopping_carts__user=user)
         return queryset
-
-
-class IngredientFilter(SearchFilter):
-    search_param = 'name'
@@ -0,0 +1,125 @@
+import ipaddress
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+WHITESPACE = re.compile(r'\s+')
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+current_metrics = ContextVar('current_metrics', default=None)
+
+
+def fingerprint(sql):
+    return WHITESPACE.sub(' ', IN_LIST.sub('(%s, ...)', sql)).strip()
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.fingerprints = Counter()
+        self.timings = defaultdict(float)
+        self.serializer_depth = 0
+        self.view_started = None
+        self.render_started = None
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def duplicates(self):
+        return {
+            sql: count for sql, count in self.fingerprints.most_common()
+            if count > 1
+        }
+
+    @contextmanager
+    def serializer(self, name):
+        start = time.perf_counter()
+        self.serializer_depth += 1
+        try:
+            yield
+        finally:
+            self.serializer_depth -= 1
+            elapsed = time.perf_counter() - start
+            self.timings[name] += elapsed
+            if not self.serializer_depth:
+                self.timings['serialize'] += elapsed
+
+    def timed(self, name, function):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.timings[name] += time.perf_counter() - start
+        return wrapper
+
+
+class PrometheusRegistry:
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._help = {}
+
+    def inc(self, name, labels, value=1, description=''):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] += value
+            self._help.setdefault(name, description)
+
+    def render(self):
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            descriptions = dict(self._help)
+        current = None
+        for (name, labels), value in counters:
+            if name != current:
+                current = name
+                lines.append(
+                    f'# HELP {self.prefix}_{name} {descriptions[name]}')
+                lines.append(f'# TYPE {self.prefix}_{name} counter')
+            label_text = ','.join(
+                '{}="{}"'.format(key, str(label).replace('"', '\\"'))
+                for key, label in labels
+            )
+            lines.append(f'{self.prefix}_{name}{{{label_text}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = PrometheusRegistry('foodgram')
+
+
+def is_allowed_address(address):
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(
+        address in ipaddress.ip_network(network.strip(), strict=False)
+        for network in settings.REQUEST_METRICS_ALLOWED_NETWORKS
+        if network.strip()
+    )
+
+
+def metrics_view(request):
+    if not (request.user.is_staff
+            or is_allowed_address(request.META.get('REMOTE_ADDR', ''))):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        registry.render(), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,95 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from api.metrics import RequestMetrics, current_metrics, registry
+
+logger = logging.getLogger('api.metrics')
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(metrics.execute_wrapper))
+                response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        self.report(request, response, metrics)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        current_metrics.get().view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        metrics = current_metrics.get()
+        metrics.render_started = time.perf_counter()
+
+        def finish_render(response):
+            metrics.timings['render'] += (
+                time.perf_counter() - metrics.render_started)
+        response.add_post_render_callback(finish_render)
+        return response
+
+    def report(self, request, response, metrics):
+        finished = time.perf_counter()
+        timings = {
+            'total': finished - metrics.started,
+            'db': metrics.db_time,
+        }
+        if metrics.view_started is not None:
+            timings['view'] = (
+                (metrics.render_started or finished) - metrics.view_started)
+        timings.update(metrics.timings)
+        duplicates = metrics.duplicates()
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={seconds * 1000:.2f}'
+            + (f';desc="{metrics.queries} queries"' if name == 'db' else '')
+            for name, seconds in timings.items()
+        )
+        match = request.resolver_match
+        view = match.view_name if match else 'unknown'
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'queries': metrics.queries,
+            'duplicate_queries': duplicates,
+            'timings_ms': {
+                name: round(seconds * 1000, 2)
+                for name, seconds in timings.items()
+            },
+        }, ensure_ascii=False))
+        labels = {'view': view, 'method': request.method}
+        registry.inc(
+            'requests_total',
+            dict(labels, status=response.status_code),
+            description='Количество запросов.')
+        registry.inc(
+            'request_duration_seconds_total', labels, timings['total'],
+            description='Суммарное время обработки запросов.')
+        registry.inc(
+            'db_queries_total', labels, metrics.queries,
+            description='Количество SQL-запросов.')
+        registry.inc(
+            'db_duration_seconds_total', labels, metrics.db_time,
+            description='Суммарное время SQL-запросов.')
+        registry.inc(
+            'db_duplicate_queries_total', labels,
+            sum(count - 1 for count in duplicates.values()),
+            description='Повторы одинаковых SQL-запросов (N+1).')
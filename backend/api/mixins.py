@@ -0,0 +1,55 @@
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from api.metrics import current_metrics
+
+
+class ReferenceCacheMixin:
+    reference_cache = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs)
+
+    def get_cache_key(self, request, **kwargs):
+        params = sorted(request.query_params.lists())
+        return f'{self.action}:{sorted(kwargs.items())}:{params}'
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        entry = self.reference_cache.get_or_set(
+            self.get_cache_key(request, **kwargs),
+            lambda: handler(request, *args, **kwargs).data
+        )
+        response = get_conditional_response(
+            request,
+            etag=entry.etag,
+            last_modified=int(entry.last_modified)
+        ) or Response(entry.data)
+        response['ETag'] = entry.etag
+        response['Last-Modified'] = http_date(entry.last_modified)
+        return response
+
+
+class SerializerMetricsMixin:
+    def get_fields(self):
+        fields = super().get_fields()
+        metrics = current_metrics.get()
+        if metrics is None:
+            return fields
+        for name, field in fields.items():
+            if isinstance(field, serializers.SerializerMethodField):
+                field.to_representation = metrics.timed(
+                    f'{type(self).__name__}.{name}', field.to_representation)
+        return fields
+
+    def to_representation(self, instance):
+        metrics = current_metrics.get()
+        if metrics is None:
+            return super().to_representation(instance)
+        with metrics.serializer(type(self).__name__):
+            return super().to_representation(instance)
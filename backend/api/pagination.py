@@ -1,5 +1,173 @@
+import base64
+import json
+import re
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from recipes.models import FeedEntry
+
+COUNT_MODES = ('exact', 'estimate', 'none')
+ESTIMATED_ROWS = re.compile(r'rows=(\d+)')
+
+
+def keyset_filter(ordering, values):
+    condition = Q()
+    equal = {}
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= Q(**equal, **{f'{name}__{lookup}': value})
+        equal[name] = value
+    return condition
+
+
+def estimate_count(queryset):
+    if connections[queryset.db].vendor != 'postgresql':
+        return queryset.count()
+    match = ESTIMATED_ROWS.search(queryset.order_by().explain())
+    return int(match.group(1)) if match else None
 
 
 class PageLimitPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    cursor_ordering = ('-pub_date', '-id')
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.cursor = request.query_params.get(self.cursor_query_param)
+        self.count_mode = request.query_params.get(
+            self.count_query_param,
+            'exact' if self.cursor is None else 'none'
+        )
+        if self.count_mode not in COUNT_MODES:
+            raise ValidationError({
+                self.count_query_param:
+                    f'Допустимые значения: {", ".join(COUNT_MODES)}.'
+            })
+        if self.cursor is None and self.count_mode == 'exact':
+            return super().paginate_queryset(queryset, request, view)
+
+        self.limit = self.get_page_size(request)
+        self.count = self.get_count(queryset)
+        if self.cursor is None:
+            return self.paginate_by_offset(queryset)
+        self.ordering = getattr(view, 'cursor_ordering', self.cursor_ordering)
+        return self.paginate_by_cursor(queryset)
+
+    def get_count(self, queryset):
+        if self.count_mode == 'exact':
+            return queryset.count()
+        if self.count_mode == 'estimate':
+            return estimate_count(queryset)
+        return None
+
+    def paginate_by_offset(self, queryset):
+        try:
+            self.page_number = int(self.request.query_params.get(
+                self.page_query_param, 1))
+        except ValueError:
+            self.page_number = 0
+        if self.page_number < 1:
+            raise NotFound(self.invalid_page_message)
+        offset = (self.page_number - 1) * self.limit
+        results = list(queryset[offset:offset + self.limit + 1])
+        self.has_next = len(results) > self.limit
+        return results[:self.limit]
+
+    def paginate_by_cursor(self, queryset):
+        queryset = queryset.order_by(*self.ordering)
+        if self.cursor:
+            queryset = queryset.filter(
+                keyset_filter(self.ordering, self.decode_cursor(queryset)))
+        results = list(queryset[:self.limit + 1])
+        self.has_next = len(results) > self.limit
+        results = results[:self.limit]
+        self.last = results[-1] if results else None
+        return results
+
+    def decode_cursor(self, queryset):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(
+                self.cursor.encode()).decode())
+            if len(values) != len(self.ordering):
+                raise ValueError
+            return [
+                queryset.model._meta.get_field(
+                    field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValueError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance):
+        values = []
+        for field in self.ordering:
+            value = getattr(instance, field.lstrip('-'))
+            values.append(
+                value.isoformat() if hasattr(value, 'isoformat') else value)
+        return base64.urlsafe_b64encode(
+            json.dumps(values).encode()).decode()
+
+    def get_next_link(self):
+        if hasattr(self, 'page'):
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.cursor is None:
+            return replace_query_param(
+                url, self.page_query_param, self.page_number + 1)
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.last))
+
+    def get_previous_link(self):
+        if hasattr(self, 'page'):
+            return super().get_previous_link()
+        if self.cursor is not None or self.page_number == 1:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(
+            url, self.page_query_param, self.page_number - 1)
+
+    def get_paginated_response(self, data):
+        if hasattr(self, 'page'):
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
+
+
+class RankedPagination(PageNumberPagination):
+    page_size_query_param = 'limit'
+
+
+class FeedPagination(PageLimitPagination):
+    cursor_ordering = ('-pub_date', '-recipe_id')
+
+    def paginate_feed(self, read, request):
+        self.request = request
+        self.cursor = request.query_params.get(self.cursor_query_param, '')
+        self.count = None
+        self.limit = self.get_page_size(request)
+        self.ordering = self.cursor_ordering
+        after = (
+            self.decode_cursor(FeedEntry.objects) if self.cursor else None)
+        results = read(after, self.limit + 1)
+        self.has_next = len(results) > self.limit
+        results = results[:self.limit]
+        self.last = results[-1] if results else None
+        return results
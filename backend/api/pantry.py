@@ -0,0 +1,158 @@
+import threading
+from itertools import chain
+
+import numpy as np
+from django.db.models import Max
+
+from recipes.models import IngredientInRecipe, RecipeChange
+
+JOURNAL_MAX_GAP = 1000
+JOURNAL_OVERLAP = 100
+JOURNAL_PRUNE_EVERY = 1000
+EMPTY = np.empty(0, dtype=np.int64)
+
+
+class RecipeIngredientIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._seq = None
+        self._applied = set()
+
+    def mark_changed(self, recipe_ids):
+        RecipeChange.objects.bulk_create(
+            RecipeChange(recipe_id=recipe_id) for recipe_id in recipe_ids)
+
+    def invalidate(self):
+        RecipeChange.objects.create(recipe_id=None)
+
+    def remember(self, change_ids, seq):
+        self._applied = {
+            change_id for change_id in self._applied.union(change_ids)
+            if change_id > seq - JOURNAL_OVERLAP
+        }
+        self._seq = seq
+
+    def sync(self):
+        if self._seq is None:
+            self.load()
+            return
+        changes = [
+            (change_id, recipe_id)
+            for change_id, recipe_id in RecipeChange.objects.filter(
+                id__gt=self._seq - JOURNAL_OVERLAP
+            ).order_by('id').values_list(
+                'id', 'recipe_id')[:JOURNAL_MAX_GAP + JOURNAL_OVERLAP]
+            if change_id not in self._applied
+        ]
+        if not changes:
+            return
+        seq = max(self._seq, changes[-1][0])
+        recipe_ids = {recipe_id for _, recipe_id in changes}
+        if None in recipe_ids or seq - self._seq > JOURNAL_MAX_GAP:
+            self.load()
+            return
+        self.update(recipe_ids)
+        if seq // JOURNAL_PRUNE_EVERY > self._seq // JOURNAL_PRUNE_EVERY:
+            self.prune(seq)
+        self.remember([change_id for change_id, _ in changes], seq)
+
+    @staticmethod
+    def prune(seq):
+        RecipeChange.objects.filter(
+            id__lte=seq - JOURNAL_MAX_GAP - JOURNAL_OVERLAP).delete()
+
+    def load(self):
+        seq = RecipeChange.objects.aggregate(seq=Max('id'))['seq'] or 0
+        applied = list(RecipeChange.objects.filter(
+            id__gt=seq - JOURNAL_OVERLAP, id__lte=seq
+        ).values_list('id', flat=True))
+        pairs = np.fromiter(
+            chain.from_iterable(
+                IngredientInRecipe.objects.order_by().distinct().values_list(
+                    'recipe_id', 'ingredient_id').iterator()),
+            dtype=np.int64
+        ).reshape(-1, 2)
+        recipe_ids, positions = np.unique(pairs[:, 0], return_inverse=True)
+        ingredient_ids = pairs[:, 1]
+        self._recipe_ids = recipe_ids
+        self._loaded = len(recipe_ids)
+        self._sizes = np.bincount(positions, minlength=len(recipe_ids))
+        by_recipe = np.argsort(positions, kind='stable')
+        self._indices = ingredient_ids[by_recipe]
+        self._indptr = np.concatenate(([0], np.cumsum(self._sizes)))
+        self._appended = {}
+        self._overrides = {}
+        by_ingredient = np.argsort(ingredient_ids, kind='stable')
+        keys, starts = np.unique(
+            ingredient_ids[by_ingredient], return_index=True)
+        self._postings = dict(zip(
+            keys.tolist(), np.split(positions[by_ingredient], starts[1:])))
+        self._applied = set()
+        self.remember(applied, seq)
+        self.prune(seq)
+
+    def position(self, recipe_id):
+        index = np.searchsorted(self._recipe_ids[:self._loaded], recipe_id)
+        if (index < self._loaded
+                and self._recipe_ids[index] == recipe_id):
+            return int(index)
+        return self._appended.get(recipe_id)
+
+    def ingredients_of(self, position):
+        if position in self._overrides:
+            return self._overrides[position]
+        start, end = self._indptr[position], self._indptr[position + 1]
+        return set(self._indices[start:end].tolist())
+
+    def update(self, recipe_ids):
+        current = {recipe_id: set() for recipe_id in recipe_ids}
+        for recipe_id, ingredient_id in IngredientInRecipe.objects.filter(
+                recipe_id__in=recipe_ids).values_list(
+                    'recipe_id', 'ingredient_id'):
+            current[recipe_id].add(ingredient_id)
+        appended, sizes, added, removed = [], {}, {}, {}
+        for recipe_id, ingredients in current.items():
+            position = self.position(recipe_id)
+            if position is not None:
+                previous = self.ingredients_of(position)
+            elif ingredients:
+                position = len(self._recipe_ids) + len(appended)
+                appended.append(recipe_id)
+                self._appended[recipe_id] = position
+                previous = set()
+            else:
+                continue
+            for ingredient_id in previous - ingredients:
+                removed.setdefault(ingredient_id, []).append(position)
+            for ingredient_id in ingredients - previous:
+                added.setdefault(ingredient_id, []).append(position)
+            sizes[position] = len(ingredients)
+            self._overrides[position] = ingredients
+        if appended:
+            self._recipe_ids = np.concatenate((self._recipe_ids, appended))
+            self._sizes = np.concatenate(
+                (self._sizes, np.zeros(len(appended), dtype=np.int64)))
+        self._sizes[list(sizes)] = list(sizes.values())
+        for ingredient_id in removed.keys() | added.keys():
+            postings = self._postings.get(ingredient_id, EMPTY)
+            if ingredient_id in removed:
+                postings = postings[~np.isin(postings, removed[ingredient_id])]
+            self._postings[ingredient_id] = np.concatenate(
+                (postings, added.get(ingredient_id, EMPTY)))
+
+    def rank(self, ingredient_ids):
+        with self._lock:
+            self.sync()
+            matched = np.zeros(len(self._recipe_ids), dtype=np.int32)
+            for ingredient_id in set(ingredient_ids):
+                postings = self._postings.get(ingredient_id)
+                if postings is not None:
+                    matched[postings] += 1
+            candidates = np.flatnonzero(matched)
+            missing = self._sizes[candidates] - matched[candidates]
+            recipe_ids = self._recipe_ids[candidates]
+            order = np.lexsort((-recipe_ids, missing))
+            return recipe_ids[order], missing[order]
+
+
+recipe_ingredient_index = RecipeIngredientIndex()
@@ -0,0 +1,27 @@
+import json
+
+from django.utils.datastructures import MultiValueDict
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import DataAndFiles, MultiPartParser
+
+
+class MultiPartJSONParser(MultiPartParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        result = super().parse(stream, media_type, parser_context)
+        view = (parser_context or {}).get('view')
+        json_fields = getattr(view, 'multipart_json_fields', ())
+        data = {
+            key: values[0] if len(values) == 1 else values
+            for key, values in result.data.lists()
+        }
+        # Request.data сливает data и files через dict.update, поэтому
+        # файлы сразу кладутся в обычный словарь.
+        data.update(result.files.dict())
+        for field in json_fields:
+            if not isinstance(data.get(field), str):
+                continue
+            try:
+                data[field] = json.loads(data[field])
+            except ValueError:
+                raise ParseError(f'Поле {field} должно содержать JSON.')
+        return DataAndFiles(data, MultiValueDict())
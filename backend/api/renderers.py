@@ -0,0 +1,73 @@
+import csv
+import json
+from abc import ABCMeta, abstractmethod
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.renderers import BaseRenderer
+
+SHOPPING_LIST_RENDERERS = []
+
+
+def register_shopping_list_renderer(renderer_class):
+    if renderer_class.__abstractmethods__:
+        raise ImproperlyConfigured(
+            f'{renderer_class.__name__} должен реализовать stream().')
+    SHOPPING_LIST_RENDERERS.append(renderer_class)
+    return renderer_class
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+class ShoppingListRenderer(BaseRenderer, metaclass=ABCMeta):
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return ''.join(self.stream(data)).encode(self.charset)
+
+    @abstractmethod
+    def stream(self, items):
+        pass
+
+
+@register_shopping_list_renderer
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, items):
+        yield 'Список покупок:\n'
+        for item in items:
+            yield (
+                f'{item["name"]} - '
+                f'{item["amount"]} {item["measurement_unit"]}\n'
+            )
+
+
+@register_shopping_list_renderer
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, items):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('name', 'amount', 'measurement_unit'))
+        for item in items:
+            yield writer.writerow(
+                (item['name'], item['amount'], item['measurement_unit'])
+            )
+
+
+@register_shopping_list_renderer
+class ShoppingListJSONRenderer(ShoppingListRenderer):
+    media_type = 'application/json'
+    format = 'json'
+
+    def stream(self, items):
+        separator = '['
+        for item in items:
+            yield separator + json.dumps(item, ensure_ascii=False)
+            separator = ','
+        yield ']' if separator == ',' else '[]'
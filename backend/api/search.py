@@ -0,0 +1,50 @@
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+WORDS = re.compile(r'\w+')
+ORDERING = ('-search_rank', '-pub_date', '-id')
+
+
+class PostgresRecipeSearch:
+    config = 'russian'
+
+    def search(self, queryset, query):
+        params = (self.config, query)
+        return queryset.filter(RawSQL(
+            'recipes_recipe.search_vector @@ '
+            'websearch_to_tsquery(%s::regconfig, %s)',
+            params, BooleanField()
+        )).annotate(search_rank=RawSQL(
+            'ts_rank_cd(recipes_recipe.search_vector, '
+            'websearch_to_tsquery(%s::regconfig, %s))',
+            params, FloatField()
+        )).order_by(*ORDERING)
+
+
+class SqliteRecipeSearch:
+    def search(self, queryset, query):
+        words = WORDS.findall(query)
+        if not words:
+            return queryset.none()
+        match = ' '.join(f'"{word}"*' for word in words)
+        return queryset.extra(
+            tables=('recipes_recipe_fts',),
+            where=('recipes_recipe_fts.rowid = recipes_recipe.id',
+                   'recipes_recipe_fts MATCH %s'),
+            params=(match,),
+            select={
+                'search_rank': '-bm25(recipes_recipe_fts, 10.0, 1.0)'},
+        ).order_by(*ORDERING)
+
+
+_postgres_search = PostgresRecipeSearch()
+_sqlite_search = SqliteRecipeSearch()
+
+
+def search_recipes(queryset, query):
+    if connection.vendor == 'postgresql':
+        return _postgres_search.search(queryset, query)
+    return _sqlite_search.search(queryset, query)
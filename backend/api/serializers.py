@@ -1,28 +1,44 @@
-from drf_extra_fields.fields import Base64ImageField
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from django.utils import timezone
 from rest_framework import serializers, status
 from rest_framework.exceptions import ValidationError
 
 from recipes import constants
-from recipes.models import (Favorite, Ingredient, IngredientInRecipe,
-                            Recipe, ShoppingCart, Tag)
+from recipes.models import (FeedEntry, Ingredient, IngredientInRecipe,
+                            Recipe, ShoppingListItem, Tag)
 from users.models import Subscribe, User
 
+from .fields import RecipeImageField
+from .mixins import SerializerMetricsMixin
 
-class UserSerializer(serializers.ModelSerializer):
+
+def join_ids(ids):
+    return ', '.join(map(str, sorted(ids)))
+
+
+class UserSerializer(SerializerMetricsMixin,
+                     serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
         model = User
         fields = ('email', 'id', 'username',
-                  'first_name', 'last_name', 'is_subscribed')
+                  'first_name', 'last_name', 'is_subscribed',
+                  'recipes_count', 'followers_count')
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         return (request.user.is_authenticated
                 and request.user.follower.filter(author=obj).exists())
 
 
-class RecipeToRepresentationSerializer(serializers.ModelSerializer):
+class RecipeToRepresentationSerializer(SerializerMetricsMixin,
+                                       serializers.ModelSerializer):
+    image = RecipeImageField(rendition='thumbnail', read_only=True)
+
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
@@ -34,26 +50,6 @@ class TagSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'color', 'slug')
 
 
-class FavoriteSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Favorite
-        fields = ('id', 'user', 'recipe')
-
-    def validate(self, data):
-        user = data.get('user')
-        recipe = data.get('recipe')
-        if Favorite.objects.filter(user=user, recipe=recipe).exists():
-            raise serializers.ValidationError({
-                'errors': 'Рецепт уже добавлен в избранное'})
-        return data
-
-    def to_representation(self, instance):
-        return RecipeToRepresentationSerializer(
-            instance.recipe,
-            context={'request': self.context.get('request')}
-        ).data
-
-
 class IngredientSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ingredient
@@ -62,33 +58,27 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 class SubscribeGetSerializer(UserSerializer):
     recipes = serializers.SerializerMethodField(read_only=True)
-    recipes_count = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = User
         fields = ('email', 'id', 'username', 'first_name', 'last_name',
-                  'is_subscribed', 'recipes', 'recipes_count')
+                  'is_subscribed', 'recipes', 'recipes_count',
+                  'followers_count')
 
     def get_recipes(self, obj):
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
-        recipes = obj.recipe.all()
-        limit = request.query_params.get('recipes_limit')
-        if limit:
-            try:
-                limit = int(limit)
-            except ValueError:
-                raise serializers.ValidationError(
-                    {'recipes_limit': 'Значение параметра должно быть int.'}
-                )
-            recipes = recipes[:int(limit)]
-        return RecipeReadSerializer(
+        if hasattr(obj, 'latest_recipes'):
+            recipes = obj.latest_recipes
+        else:
+            recipes = obj.recipe.all()
+            limit = self.context.get('recipes_limit')
+            if limit is not None:
+                recipes = recipes[:limit]
+        return RecipeToRepresentationSerializer(
             recipes, many=True, context={'request': request}).data
 
-    def get_recipes_count(self, obj):
-        return obj.recipe.all().count()
-
 
 class SubscribeCreateDeleteSerializer(serializers.ModelSerializer):
 
@@ -125,9 +115,7 @@ class IngredientInRecipeReadSerializer(serializers.ModelSerializer):
 
 
 class IngredientInRecipeSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all()
-    )
+    id = serializers.IntegerField(min_value=1)
     amount = serializers.IntegerField(
         min_value=constants.LENGTH_OF_MIN_VALUE,
         max_value=constants.LENGTH_OF_MAX_AMOUNT
@@ -138,7 +126,8 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount')
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeReadSerializer(SerializerMetricsMixin,
+                           serializers.ModelSerializer):
     tags = TagSerializer(read_only=False, many=True)
     author = UserSerializer(read_only=True, many=False)
     ingredients = IngredientInRecipeReadSerializer(
@@ -146,21 +135,26 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         source='ingredient')
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
-    image = Base64ImageField(max_length=None)
+    image = RecipeImageField(rendition='card', detail_rendition='full')
 
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients',
                   'is_favorited', 'is_in_shopping_cart',
-                  'name', 'image', 'text', 'cooking_time'
+                  'name', 'image', 'text', 'cooking_time',
+                  'favorites_count', 'in_carts_count'
                   )
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         request = self.context.get('request')
         return (request.user.is_authenticated
                 and obj.favorite.filter(user=request.user).exists())
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         request = self.context.get('request')
         return (request.user.is_authenticated
                 and obj.shopping_carts.filter(user=request.user).exists())
@@ -170,12 +164,10 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     ingredients = IngredientInRecipeSerializer(
         many=True,
     )
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True,
-        queryset=Tag.objects.all(),
-        error_messages={'does_not_exist': 'Указанного тега не существует'}
+    tags = serializers.ListField(
+        child=serializers.IntegerField(min_value=1)
     )
-    image = Base64ImageField(max_length=None)
+    image = RecipeImageField(max_length=None)
     author = UserSerializer(read_only=True)
     cooking_time = serializers.IntegerField(
         min_value=constants.LENGTH_OF_MIN_VALUE,
@@ -192,14 +184,6 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         tags = data.get('tags')
         ingredients = data.get('ingredients')
 
-        if len(tags) > len(set(tags)):
-            raise serializers.ValidationError({'tags': 'Теги повторяются!'})
-
-        ingredient_ids = {ingredient['id'] for ingredient in ingredients}
-        if len(ingredient_ids) > len(ingredients):
-            raise serializers.ValidationError(
-                'Ингредиенты должны быть уникальны')
-
         if not tags:
             raise serializers.ValidationError(
                 {'tags': 'Выберите хотя бы один тег'})
@@ -208,19 +192,83 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 {'ingredients': 'Выберите хотя бы один ингредиент'})
 
+        if len(tags) > len(set(tags)):
+            raise serializers.ValidationError({'tags': 'Теги повторяются!'})
+
+        ingredient_ids = {ingredient['id'] for ingredient in ingredients}
+        if len(ingredient_ids) < len(ingredients):
+            raise serializers.ValidationError(
+                'Ингредиенты должны быть уникальны')
+
+        errors = {}
+        missing_tags = set(tags) - set(
+            Tag.objects.filter(id__in=tags).values_list('id', flat=True))
+        if missing_tags:
+            errors['tags'] = (
+                f'Указанных тегов не существует: {join_ids(missing_tags)}')
+        missing_ingredients = ingredient_ids - set(
+            Ingredient.objects.filter(
+                id__in=ingredient_ids).values_list('id', flat=True))
+        if missing_ingredients:
+            errors['ingredients'] = (
+                'Указанных ингредиентов не существует: '
+                f'{join_ids(missing_ingredients)}')
+        if errors:
+            raise serializers.ValidationError(errors)
+
         return data
 
+    def save(self, **kwargs):
+        try:
+            return super().save(**kwargs)
+        finally:
+            image = self.validated_data.get('image')
+            if image is not None:
+                image.close()
+
     @staticmethod
     def create_ingredients(recipe, ingredients):
         ingredients_list = [
             IngredientInRecipe(
                 recipe=recipe,
-                ingredient=ingredient['id'],
+                ingredient_id=ingredient['id'],
                 amount=ingredient['amount']
             ) for ingredient in ingredients
         ]
         IngredientInRecipe.objects.bulk_create(ingredients_list)
 
+    @staticmethod
+    def update_ingredients(recipe, ingredients):
+        existing = {
+            item.ingredient_id: item
+            for item in IngredientInRecipe.objects.filter(recipe=recipe)
+        }
+        old_amounts = {
+            ingredient_id: item.amount
+            for ingredient_id, item in existing.items()
+        }
+        new_amounts = {item['id']: item['amount'] for item in ingredients}
+        removed = existing.keys() - new_amounts.keys()
+        if removed:
+            IngredientInRecipe.objects.filter(
+                recipe=recipe, ingredient_id__in=removed).delete()
+        changed = []
+        for ingredient_id, item in existing.items():
+            amount = new_amounts.get(ingredient_id, item.amount)
+            if amount != item.amount:
+                item.amount = amount
+                changed.append(item)
+        IngredientInRecipe.objects.bulk_update(changed, ('amount',))
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe=recipe,
+                ingredient_id=ingredient_id,
+                amount=new_amounts[ingredient_id]
+            ) for ingredient_id in new_amounts.keys() - existing.keys()
+        )
+        return old_amounts, new_amounts
+
+    @transaction.atomic
     def create(self, validated_data):
         request = self.context.get('request', None)
         tags = validated_data.pop('tags')
@@ -228,38 +276,58 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(author=request.user, **validated_data)
         recipe.tags.set(tags)
         self.create_ingredients(recipe, ingredients)
+        FeedEntry.objects.fan_out(recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        instance.tags.clear()
-        IngredientInRecipe.objects.filter(recipe=instance).delete()
         instance.tags.set(validated_data.pop('tags'))
-        ingredients = validated_data.pop('ingredients')
-        self.create_ingredients(instance, ingredients)
+        old_amounts, new_amounts = self.update_ingredients(
+            instance, validated_data.pop('ingredients'))
+        ShoppingListItem.objects.apply_recipe_change(
+            instance.id, old_amounts, new_amounts)
+        instance.similar_outdated_at = timezone.now()
         return super().update(instance, validated_data)
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance],
+            'tags',
+            Prefetch(
+                'ingredient',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient')
+            )
+        )
         return RecipeReadSerializer(instance, context={
             'request': self.context.get('request')
         }).data
 
 
-class ShoppingCartSerializer(serializers.ModelSerializer):
+class RecipeCoverageSerializer(RecipeReadSerializer):
+    missing_count = serializers.IntegerField(read_only=True)
 
-    class Meta:
-        model = ShoppingCart
-        fields = ('id', 'user', 'recipe')
+    class Meta(RecipeReadSerializer.Meta):
+        fields = RecipeReadSerializer.Meta.fields + ('missing_count',)
 
-    def validate(self, data):
-        user = data.get('user')
-        recipe = data.get('recipe')
-        if ShoppingCart.objects.filter(user=user, recipe=recipe).exists():
-            raise serializers.ValidationError({
-                'errors': 'Рецепт уже добавлен в избранное'})
-        return data
 
-    def to_representation(self, instance):
-        return RecipeToRepresentationSerializer(
-            instance.recipe,
-            context={'request': self.context.get('request')}
-        ).data
+class PantrySerializer(serializers.Serializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=constants.BULK_MAX_ITEMS,
+        error_messages={
+            'max_length': 'Не больше {max_length} элементов за один запрос.'
+        }
+    )
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=constants.BULK_MAX_ITEMS,
+        error_messages={
+            'max_length': 'Не больше {max_length} элементов за один запрос.'
+        }
+    )
@@ -0,0 +1,42 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from api.authentication import token_cache
+from api.cache import ingredients_cache, tags_cache
+from api.pantry import recipe_ingredient_index
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from users.models import User
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tags_cache(sender, **kwargs):
+    tags_cache.invalidate()
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredients_cache(sender, **kwargs):
+    ingredients_cache.invalidate()
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def update_recipe_ingredient_index(sender, instance, **kwargs):
+    recipe_ingredient_index.mark_changed([instance.id])
+
+
+@receiver((post_save, post_delete), sender=IngredientInRecipe)
+def update_recipe_ingredients_index(sender, instance, **kwargs):
+    recipe_ingredient_index.mark_changed([instance.recipe_id])
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_token_cache(sender, instance, **kwargs):
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens_cache(sender, instance, created, **kwargs):
+    if not created:
+        token_cache.invalidate(*Token.objects.filter(
+            user=instance).values_list('key', flat=True))
@@ -0,0 +1,706 @@
+import io
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock, skipUnless
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from api.authentication import token_cache
+from api.autocomplete import (InMemoryIngredientSearch,
+                              PostgresIngredientSearch)
+from api.cache import ingredients_cache
+from api.metrics import metrics_view
+from api.pantry import RecipeIngredientIndex
+from recipes.models import (Favorite, FeedEntry, Ingredient,
+                            IngredientInRecipe, Recipe, RecipeChange,
+                            ShoppingCart, ShoppingListItem, Tag)
+from recipes.relations import supports_returning
+from users.models import Subscribe, User
+
+
+class RecipeQueryCountTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com', password='pass',
+            first_name='Читатель', last_name='Тестовый')
+        authors = [
+            User.objects.create_user(
+                username=f'author{number}',
+                email=f'author{number}@example.com',
+                password='pass', first_name='Автор', last_name='Тестовый')
+            for number in range(3)
+        ]
+        tags = [
+            Tag.objects.create(
+                name=f'Тег {number}', slug=f'tag{number}', color='#ffffff')
+            for number in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(10)
+        ]
+        for number in range(8):
+            recipe = Recipe.objects.create(
+                author=authors[number % 3], name=f'Рецепт {number}',
+                text='Описание', cooking_time=10)
+            recipe.tags.set(tags[:number % 3 + 1])
+            IngredientInRecipe.objects.bulk_create(
+                IngredientInRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=100)
+                for ingredient in ingredients[number:number + 3]
+            )
+            if number % 2:
+                Favorite.objects.create(user=cls.user, recipe=recipe)
+                ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        Subscribe.objects.create(user=cls.user, author=recipe.author)
+        cls.recipe = recipe
+
+    def setUp(self):
+        cache.clear()
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_anonymous(self):
+        with self.assertNumQueries(4):
+            response = self.anonymous.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 6)
+
+    def test_list_authenticated(self):
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 6)
+
+    def test_detail_anonymous(self):
+        with self.assertNumQueries(3):
+            response = self.anonymous.get(f'/api/recipes/{self.recipe.id}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_detail_authenticated(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/api/recipes/{self.recipe.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['is_favorited'])
+        self.assertTrue(response.data['author']['is_subscribed'])
+
+
+class ShoppingListDownloadTest(TestCase):
+    url = '/api/recipes/download_shopping_cart/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='buyer', email='buyer@example.com', password='pass',
+            first_name='Покупатель', last_name='Тестовый')
+        cls.other = User.objects.create_user(
+            username='empty', email='empty@example.com', password='pass',
+            first_name='Пустой', last_name='Тестовый')
+        ingredient = Ingredient.objects.create(
+            name='Мука', measurement_unit='г')
+        recipe = Recipe.objects.create(
+            author=cls.other, name='Блины', text='Описание', cooking_time=10)
+        IngredientInRecipe.objects.create(
+            recipe=recipe, ingredient=ingredient, amount=200)
+        ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        ShoppingListItem.objects.add_recipes(cls.user.id, [recipe.id])
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_download_csv(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get(self.url, HTTP_ACCEPT='text/csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        self.assertIn('Мука', b''.join(response.streaming_content).decode())
+
+    def test_empty_list_error_is_json(self):
+        self.client.force_authenticate(self.other)
+        response = self.client.get(self.url, HTTP_ACCEPT='text/plain')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('Ошибка', response.json())
+
+    def test_anonymous_error_is_json(self):
+        response = self.client.get(self.url, HTTP_ACCEPT='text/csv')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertIn('detail', response.json())
+
+
+class ReferenceCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        ingredients_cache.local.clear()
+        self.client = APIClient()
+
+    def test_version_follows_database(self):
+        response = self.client.get('/api/ingredients/')
+        self.assertEqual(response.data, [])
+        Ingredient.objects.bulk_create(
+            [Ingredient(name='Соль', measurement_unit='г')])
+        ingredients_cache.local.clear()
+        response = self.client.get('/api/ingredients/')
+        self.assertEqual(
+            [row['name'] for row in response.data], ['Соль'])
+        Ingredient.objects.update(
+            name='Соль морская', updated_at=timezone.now())
+        ingredients_cache.local.clear()
+        response = self.client.get('/api/ingredients/')
+        self.assertEqual(
+            [row['name'] for row in response.data], ['Соль морская'])
+
+
+class IngredientSearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('Мука', 'Соль морская', 'Морская капуста'))
+
+    def names(self, search, name):
+        return [row['name'] for row in search.search(name)]
+
+    def test_short_queries_match_prefix_only(self):
+        search = InMemoryIngredientSearch()
+        self.assertEqual(self.names(search, 'мо'), ['Морская капуста'])
+        self.assertEqual(
+            self.names(search, 'мор'), ['Морская капуста', 'Соль морская'])
+
+    @override_settings(REFERENCE_CACHE_LOCAL_TTL=0)
+    def test_rebuilds_after_bulk_insert(self):
+        search = InMemoryIngredientSearch()
+        self.assertEqual(self.names(search, 'му'), ['Мука'])
+        Ingredient.objects.bulk_create(
+            [Ingredient(name='Мускат', measurement_unit='г')])
+        self.assertEqual(self.names(search, 'му'), ['Мука', 'Мускат'])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Только для PostgreSQL')
+    def test_postgres_prefix_query_uses_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SET enable_seqscan = off')
+        self.assertEqual(
+            self.names(PostgresIngredientSearch(), 'мо'),
+            ['Морская капуста'])
+        plan = Ingredient.objects.filter(name__istartswith='мо').explain()
+        self.assertIn('recipes_ingredient_name_prefix', plan)
+
+    def test_version_is_checked_once_per_ttl(self):
+        search = InMemoryIngredientSearch()
+        search.search('му')
+        with self.assertNumQueries(0):
+            search.search('мук')
+
+
+class RecipeToggleCounterTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='fan', email='fan@example.com', password='pass',
+            first_name='Поклонник', last_name='Тестовый')
+        cls.recipe = Recipe.objects.create(
+            author=cls.user, name='Суп', text='Описание', cooking_time=30)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def toggle(self, method, name):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(
+                f'/api/recipes/{self.recipe.id}/{name}/')
+        self.assertFalse(any(
+            'COUNT(' in query['sql'].upper() for query in queries))
+        return response.status_code
+
+    def assert_counter(self, field, value):
+        self.recipe.refresh_from_db(fields=[field])
+        self.assertEqual(getattr(self.recipe, field), value)
+
+    def test_favorite(self):
+        self.assertEqual(self.toggle('post', 'favorite'), 201)
+        self.assert_counter('favorites_count', 1)
+        self.assertEqual(self.toggle('post', 'favorite'), 400)
+        self.assert_counter('favorites_count', 1)
+        self.assertEqual(self.toggle('delete', 'favorite'), 204)
+        self.assert_counter('favorites_count', 0)
+        self.assertEqual(self.toggle('delete', 'favorite'), 404)
+        self.assert_counter('favorites_count', 0)
+
+    def test_shopping_cart(self):
+        self.assertEqual(self.toggle('post', 'shopping_cart'), 201)
+        self.assert_counter('in_carts_count', 1)
+        self.assertEqual(self.toggle('delete', 'shopping_cart'), 204)
+        self.assert_counter('in_carts_count', 0)
+
+
+class TokenCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='token', email='token@example.com', password='pass',
+            first_name='Токен', last_name='Тестовый')
+
+    def setUp(self):
+        cache.clear()
+        token_cache.local.clear()
+
+    def test_snapshot_has_no_password(self):
+        self.assertNotIn('password', token_cache.snapshot(self.user))
+
+    def test_process_local_cache_is_not_shared(self):
+        token_cache.set('key', self.user)
+        self.assertEqual(token_cache.get('key').pk, self.user.pk)
+        token_cache.local.clear()
+        self.assertIsNone(token_cache.get('key'))
+
+
+class FeedSubscriptionTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.author = (
+            User.objects.create_user(
+                username=name, email=f'{name}@example.com', password='pass',
+                first_name='Пользователь', last_name='Тестовый')
+            for name in ('follower', 'cook')
+        )
+        cls.recipes = [
+            Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {number}',
+                text='Описание', cooking_time=10)
+            for number in range(3)
+        ]
+
+    def feed(self):
+        return set(FeedEntry.objects.filter(
+            user=self.user).values_list('recipe_id', flat=True))
+
+    def test_subscription_outside_api_updates_feed(self):
+        subscription = Subscribe.objects.create(
+            user=self.user, author=self.author)
+        self.assertEqual(
+            self.feed(), {recipe.id for recipe in self.recipes})
+        subscription.delete()
+        self.assertEqual(self.feed(), set())
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=1)
+    def test_author_dropping_below_threshold_is_backfilled(self):
+        other = User.objects.create_user(
+            username='second', email='second@example.com', password='pass',
+            first_name='Пользователь', last_name='Тестовый')
+        Subscribe.objects.create(user=other, author=self.author)
+        Subscribe.objects.create(user=self.user, author=self.author)
+        self.assertEqual(self.feed(), set())
+        self.assertEqual(
+            len(FeedEntry.objects.page(self.user.id, None, 10)), 3)
+        Subscribe.objects.filter(user=other).delete()
+        self.assertEqual(
+            self.feed(), {recipe.id for recipe in self.recipes})
+
+    def test_subscribe_endpoint_updates_feed(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = f'/api/users/{self.author.id}/subscribe/'
+        self.assertEqual(client.post(url).status_code, 201)
+        self.assertEqual(len(self.feed()), 3)
+        self.assertEqual(client.delete(url).status_code, 204)
+        self.assertEqual(self.feed(), set())
+
+
+class RecipeIngredientIndexTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='chef', email='chef@example.com', password='pass',
+            first_name='Шеф', last_name='Тестовый')
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Продукт {number}', measurement_unit='г')
+            for number in range(3)
+        ]
+        cls.recipe = cls.create_recipe(cls.ingredients[:2])
+
+    @classmethod
+    def create_recipe(cls, ingredients):
+        recipe = Recipe.objects.create(
+            author=cls.author, name='Салат', text='Описание',
+            cooking_time=5)
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(recipe=recipe, ingredient=ingredient,
+                               amount=10)
+            for ingredient in ingredients
+        )
+        return recipe
+
+    def rank(self, index, *ingredients):
+        recipe_ids, missing = index.rank(
+            [ingredient.id for ingredient in ingredients])
+        return dict(zip(recipe_ids.tolist(), missing.tolist()))
+
+    def test_changes_are_read_from_database(self):
+        first, second, third = self.ingredients
+        index = RecipeIngredientIndex()
+        self.assertEqual(self.rank(index, first), {self.recipe.id: 1})
+        recipe = self.create_recipe([first, third])
+        self.assertEqual(
+            self.rank(index, first, third),
+            {self.recipe.id: 1, recipe.id: 0})
+        recipe.delete()
+        self.assertEqual(self.rank(index, third), {})
+
+    def test_ingredient_rows_are_tracked(self):
+        first, second, third = self.ingredients
+        index = RecipeIngredientIndex()
+        self.assertEqual(self.rank(index, third), {})
+        row = IngredientInRecipe.objects.create(
+            recipe=self.recipe, ingredient=third, amount=1)
+        self.assertEqual(self.rank(index, third), {self.recipe.id: 2})
+        row.delete()
+        IngredientInRecipe.objects.filter(
+            recipe=self.recipe, ingredient=second).delete()
+        self.assertEqual(self.rank(index, third), {})
+        self.assertEqual(self.rank(index, first), {self.recipe.id: 0})
+
+    def test_invalidate_reloads_index(self):
+        third = self.ingredients[2]
+        index = RecipeIngredientIndex()
+        self.assertEqual(self.rank(index, third), {})
+        IngredientInRecipe.objects.bulk_create([IngredientInRecipe(
+            recipe=self.recipe, ingredient=third, amount=1)])
+        index.invalidate()
+        self.assertEqual(self.rank(index, third), {self.recipe.id: 2})
+
+    def test_journal_is_pruned_during_sync(self):
+        index = RecipeIngredientIndex()
+        self.rank(index, self.ingredients[0])
+        with mock.patch.multiple(
+                'api.pantry', JOURNAL_MAX_GAP=3, JOURNAL_OVERLAP=1,
+                JOURNAL_PRUNE_EVERY=2):
+            for _ in range(8):
+                index.mark_changed([self.recipe.id])
+                self.rank(index, self.ingredients[0])
+        self.assertLessEqual(RecipeChange.objects.count(), 6)
+
+
+class BulkRelationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.other, cls.author = (
+            User.objects.create_user(
+                username=name, email=f'{name}@example.com', password='pass',
+                first_name='Пользователь', last_name='Тестовый')
+            for name in ('bulk', 'other', 'writer')
+        )
+        ingredient = Ingredient.objects.create(
+            name='Сахар', measurement_unit='г')
+        cls.recipes = []
+        for number in range(2):
+            recipe = Recipe.objects.create(
+                author=cls.author, name=f'Компот {number}',
+                text='Описание', cooking_time=15)
+            IngredientInRecipe.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=50)
+            cls.recipes.append(recipe)
+        Favorite.objects.create(user=cls.other, recipe=cls.recipes[0])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def bulk(self, method, url, ids):
+        response = getattr(self.client, method)(
+            url, {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return [result['status'] for result in response.data['results']]
+
+    def counters(self, field):
+        return [
+            getattr(Recipe.objects.get(pk=recipe.pk), field)
+            for recipe in self.recipes
+        ]
+
+    def check_relations(self):
+        first, second = (recipe.id for recipe in self.recipes)
+        url = '/api/recipes/favorite/bulk/'
+        self.assertEqual(
+            self.bulk('post', url, [first, second, 99999]),
+            ['created', 'created', 'not_found'])
+        self.assertEqual(self.counters('favorites_count'), [2, 1])
+        self.assertEqual(self.bulk('post', url, [first]), ['exists'])
+        self.assertEqual(self.counters('favorites_count'), [2, 1])
+        self.assertEqual(
+            self.bulk('delete', url, [first, second, 99999]),
+            ['deleted', 'deleted', 'not_found'])
+        self.assertEqual(self.counters('favorites_count'), [1, 0])
+
+        url = '/api/recipes/shopping_cart/bulk/'
+        self.bulk('post', url, [first, second])
+        self.assertEqual(self.counters('in_carts_count'), [1, 1])
+        self.assertEqual(
+            ShoppingListItem.objects.get(user=self.user).total_amount, 100)
+        self.bulk('delete', url, [first])
+        self.assertEqual(self.counters('in_carts_count'), [0, 1])
+        self.assertEqual(
+            ShoppingListItem.objects.get(user=self.user).total_amount, 50)
+
+        url = '/api/users/subscribe/bulk/'
+        self.assertEqual(
+            self.bulk('post', url, [self.author.id, self.user.id]),
+            ['created', 'invalid'])
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 1)
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(self.bulk('delete', url, [self.author.id]),
+                         ['deleted'])
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 0)
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+
+    def test_with_returning(self):
+        if not supports_returning():
+            self.skipTest('SQLite без RETURNING')
+        self.check_relations()
+
+    def test_without_returning(self):
+        with mock.patch(
+                'recipes.relations.supports_returning', return_value=False):
+            self.check_relations()
+
+
+@override_settings(REQUEST_METRICS_ALLOWED_NETWORKS=['127.0.0.1/32'])
+class MetricsViewTest(TestCase):
+    def request(self, address, user=None):
+        request = RequestFactory().get(
+            '/api/metrics/', REMOTE_ADDR=address)
+        request.user = user or AnonymousUser()
+        return metrics_view(request).status_code
+
+    def test_access(self):
+        self.assertEqual(self.request('127.0.0.1'), 200)
+        self.assertEqual(self.request('10.0.0.1'), 403)
+        staff = User(username='staff', is_staff=True)
+        self.assertEqual(self.request('10.0.0.1', staff), 200)
+
+
+class RecipeUpdateTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='cook', email='cook@example.com', password='pass',
+            first_name='Повар', last_name='Тестовый')
+        cls.buyer = User.objects.create_user(
+            username='shopper', email='shopper@example.com', password='pass',
+            first_name='Покупатель', last_name='Тестовый')
+        cls.tag = Tag.objects.create(
+            name='Обед', slug='lunch', color='#ffffff')
+        cls.flour, cls.milk, cls.eggs, cls.salt = (
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('Мука', 'Молоко', 'Яйца', 'Соль')
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Блины', text='Описание',
+            cooking_time=10)
+        cls.recipe.tags.set([cls.tag])
+        for ingredient, amount in ((cls.flour, 200), (cls.milk, 500),
+                                   (cls.eggs, 2)):
+            IngredientInRecipe.objects.create(
+                recipe=cls.recipe, ingredient=ingredient, amount=amount)
+        other = Recipe.objects.create(
+            author=cls.author, name='Тесто', text='Описание',
+            cooking_time=10)
+        IngredientInRecipe.objects.create(
+            recipe=other, ingredient=cls.flour, amount=100)
+        for recipe in (cls.recipe, other):
+            ShoppingCart.objects.create(user=cls.buyer, recipe=recipe)
+        ShoppingListItem.objects.add_recipes(
+            cls.buyer.id, [cls.recipe.id, other.id])
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def test_ingredient_diff_updates_shopping_list(self):
+        response = self.client.patch(
+            f'/api/recipes/{self.recipe.id}/',
+            {
+                'tags': [self.tag.id],
+                'ingredients': [
+                    {'id': self.flour.id, 'amount': 300},
+                    {'id': self.milk.id, 'amount': 500},
+                    {'id': self.salt.id, 'amount': 5},
+                ],
+            },
+            format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            dict(self.recipe.ingredient.values_list(
+                'ingredient_id', 'amount')),
+            {self.flour.id: 300, self.milk.id: 500, self.salt.id: 5})
+        self.assertEqual(
+            dict(ShoppingListItem.objects.filter(
+                user=self.buyer).values_list('ingredient_id', 'total_amount')),
+            {self.flour.id: 400, self.milk.id: 500, self.salt.id: 5})
+
+
+class CursorPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='writer', email='writer@example.com', password='pass',
+            first_name='Автор', last_name='Тестовый')
+        recipes = [
+            Recipe.objects.create(
+                author=author, name=f'Рецепт {number}', text='Описание',
+                cooking_time=10)
+            for number in range(7)
+        ]
+        Recipe.objects.filter(
+            id__in=[recipe.id for recipe in recipes[:4]]
+        ).update(pub_date=recipes[0].pub_date)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_follows_next_links(self):
+        expected = list(Recipe.objects.order_by(
+            '-pub_date', '-id').values_list('id', flat=True))
+        url = '/api/recipes/?limit=3&cursor='
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIsNone(response.data['count'])
+            self.assertIsNone(response.data['previous'])
+            ids.extend(recipe['id'] for recipe in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(ids, expected)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/recipes/?cursor=broken')
+        self.assertEqual(response.status_code, 404)
+
+
+class MultipartRecipeTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='uploader', email='uploader@example.com',
+            password='pass', first_name='Автор', last_name='Тестовый')
+        cls.tag = Tag.objects.create(
+            name='Завтрак', slug='breakfast', color='#ffffff')
+        cls.ingredient = Ingredient.objects.create(
+            name='Овсянка', measurement_unit='г')
+
+    def setUp(self):
+        cache.clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def payload(self, ingredients):
+        image = io.BytesIO()
+        Image.new('RGB', (1, 1), '#E26C2D').save(image, 'PNG')
+        return {
+            'name': 'Каша',
+            'text': 'Описание',
+            'cooking_time': 15,
+            'tags': json.dumps([self.tag.id]),
+            'ingredients': ingredients,
+            'image': SimpleUploadedFile(
+                'porridge.png', image.getvalue(), 'image/png'),
+        }
+
+    def test_create_with_file(self):
+        response = self.client.post(
+            '/api/recipes/',
+            self.payload(json.dumps([
+                {'id': self.ingredient.id, 'amount': 80}])),
+            format='multipart')
+        self.assertEqual(response.status_code, 201)
+        recipe = Recipe.objects.get(id=response.data['id'])
+        self.assertTrue(recipe.image.name.endswith('.png'))
+        self.assertEqual(list(recipe.tags.values_list('id', flat=True)),
+                         [self.tag.id])
+        self.assertEqual(
+            list(recipe.ingredient.values_list('ingredient_id', 'amount')),
+            [(self.ingredient.id, 80)])
+
+    def test_invalid_json_field(self):
+        response = self.client.post(
+            '/api/recipes/', self.payload('[{"id": '), format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Recipe.objects.exists())
+
+
+class ImportCsvTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        (self.directory / 'ingredients.csv').write_text(
+            'Мука,г\nСоль,г\n\nМука,г\n', encoding='utf-8')
+        (self.directory / 'ingredients.json').write_text(json.dumps([
+            {'name': 'Молоко', 'measurement_unit': 'мл'},
+            {'name': 'Соль', 'measurement_unit': 'г'},
+        ], ensure_ascii=False), encoding='utf-8')
+        (self.directory / 'tags.json').write_text(json.dumps([
+            {'name': 'Завтрак', 'slug': 'breakfast', 'color': '#E26C2D'},
+        ], ensure_ascii=False), encoding='utf-8')
+
+    def import_data(self, *options):
+        stdout = io.StringIO()
+        with mock.patch(
+                'recipes.management.commands.import_csv.JSON_CHUNK_SIZE', 8):
+            call_command(
+                'import_csv',
+                '--path', str(self.directory / 'ingredients.csv'),
+                str(self.directory / 'ingredients.json'),
+                '--tags-path', str(self.directory / 'tags.json'),
+                '--batch-size', '2',
+                *options,
+                stdout=stdout, no_color=True)
+        return stdout.getvalue()
+
+    def test_import_is_idempotent(self):
+        output = self.import_data()
+        self.assertIn('Ингредиенты успешно загружены: добавлено 3, '
+                      'уже существовало 0.', output)
+        self.assertIn('Теги успешно загружены: добавлено 1, '
+                      'уже существовало 0.', output)
+        self.assertEqual(
+            set(Ingredient.objects.values_list('name', 'measurement_unit')),
+            {('Мука', 'г'), ('Соль', 'г'), ('Молоко', 'мл')})
+        self.assertTrue(Tag.objects.filter(
+            slug='breakfast', color='#E26C2D').exists())
+        output = self.import_data()
+        self.assertIn('добавлено 0, уже существовало 3.', output)
+        self.assertEqual(Ingredient.objects.count(), 3)
+
+    def test_dry_run_rolls_back(self):
+        output = self.import_data('--dry-run')
+        self.assertIn('Пробный запуск', output)
+        self.assertFalse(Ingredient.objects.exists())
+        self.assertFalse(Tag.objects.exists())
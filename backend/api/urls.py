@@ -1,7 +1,9 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
 from api import views
+from api.metrics import metrics_view
 
 app_name = 'api'
 
@@ -17,7 +19,15 @@ urlpatterns = [
         name='subscriptions',
     ),
     path('users/<int:author_id>/subscribe/', views.SubscribeAPIView.as_view()),
+    path(
+        'users/subscribe/bulk/',
+        views.SubscribeBulkAPIView.as_view(),
+        name='subscribe_bulk',
+    ),
     path('', include(router.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
 ]
+
+if settings.REQUEST_METRICS_ENDPOINT:
+    urlpatterns.insert(0, path('metrics/', metrics_view, name='metrics'))
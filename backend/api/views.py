@@ -1,63 +1,90 @@
-from django.db.models import Sum
-from django.shortcuts import HttpResponse, get_object_or_404
+from itertools import chain
+
+from django.db import IntegrityError
+from django.db.models import (BooleanField, Exists, F, OuterRef, Prefetch,
+                              Value)
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.generics import ListAPIView
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ReadOnlyModelViewSet
 
-from recipes.models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
-                            ShoppingCart, Tag)
+from recipes.models import (FeedEntry, Favorite, Ingredient,
+                            IngredientInRecipe, Recipe, ShoppingCart,
+                            ShoppingListItem, Tag)
+from recipes.relations import (CREATED, DELETED, add_relations,
+                               remove_relations)
 from users.models import Subscribe, User
-from .filters import IngredientFilter, RecipeFilter
-from .pagination import PageLimitPagination
+
+from .autocomplete import search_ingredients
+from .cache import ingredients_cache, tags_cache
+from .filters import RecipeFilter
+from .mixins import ReferenceCacheMixin
+from .pagination import FeedPagination, PageLimitPagination, RankedPagination
+from .pantry import recipe_ingredient_index
+from .parsers import MultiPartJSONParser
 from .permissions import IsAuthorOrReadOnly
-from .serializers import (FavoriteSerializer, IngredientSerializer,
-                          RecipeCreateSerializer, ShoppingCartSerializer,
+from .renderers import SHOPPING_LIST_RENDERERS, ShoppingListRenderer
+from .serializers import (BulkIdsSerializer, IngredientSerializer,
+                          PantrySerializer, RecipeCoverageSerializer,
+                          RecipeCreateSerializer,
+                          RecipeToRepresentationSerializer,
                           SubscribeGetSerializer,
                           SubscribeCreateDeleteSerializer, TagSerializer,
                           RecipeReadSerializer)
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.all().select_related(
-        'author'
-    ).prefetch_related('tags', 'ingredients')
+    queryset = Recipe.objects.all().prefetch_related(
+        'tags',
+        Prefetch(
+            'ingredient',
+            queryset=IngredientInRecipe.objects.select_related('ingredient')
+        ),
+    )
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     serializer_class = RecipeCreateSerializer
     permission_classes = [IsAuthorOrReadOnly]
     pagination_class = PageLimitPagination
+    parser_classes = (JSONParser, MultiPartJSONParser)
+    lookup_value_regex = r'\d+'
+    multipart_json_fields = ('ingredients', 'tags')
 
     @staticmethod
-    def favorite_shopping_cart(serializers, request, pk):
-        context = {'request': request}
-        data = {
-            'user': request.user.id,
-            'recipe': pk
-        }
-        serializer = serializers(data=data, context=context)
-        serializer.is_valid(raise_exception=True)
-        serializer.save()
+    def add_to_recipe_list(model, request, pk, exists_message):
+        recipe = get_object_or_404(Recipe, pk=pk)
+        try:
+            result, = add_relations(
+                model, 'recipe', request.user.id, [recipe.id], {recipe.id})
+        except IntegrityError:
+            raise NotFound
+        if result['status'] != CREATED:
+            return Response(
+                {'errors': exists_message},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        serializer = RecipeToRepresentationSerializer(
+            recipe, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @staticmethod
-    def send_message(ingredients):
-        text = 'Список покупок:\n'
-        for item in ingredients:
-            text += (
-                f'{item["ingredient__name"]} - '
-                f'{item["amount"]} {item["ingredient__measurement_unit"]}\n'
+    def remove_from_recipe_list(model, request, pk, missing_message):
+        result, = remove_relations(model, 'recipe', request.user.id, [pk])
+        if result['status'] != DELETED:
+            return Response(
+                {'errors': missing_message},
+                status=status.HTTP_404_NOT_FOUND
             )
-
-        response = HttpResponse(text, content_type='text/plain')
-        response['Content-Disposition'] = (
-            'attachment; filename=shopping_list.txt'
-        )
-        return response
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
         detail=True,
@@ -67,16 +94,13 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=(permissions.IsAuthenticated,)
     )
     def favorite(self, request, pk):
-        return self.favorite_shopping_cart(FavoriteSerializer, request, pk)
+        return self.add_to_recipe_list(
+            Favorite, request, pk, 'Рецепт уже добавлен в избранное')
 
     @favorite.mapping.delete
     def delete_favorite(self, request, pk):
-        get_object_or_404(
-            Favorite,
-            user=request.user,
-            recipe=get_object_or_404(Recipe, pk=pk)
-        ).delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        return self.remove_from_recipe_list(
+            Favorite, request, int(pk), 'Рецепта нет в избранном')
 
     @action(
         detail=True,
@@ -86,40 +110,167 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=(permissions.IsAuthenticated,)
     )
     def shopping_cart(self, request, pk):
-        return self.favorite_shopping_cart(
-            ShoppingCartSerializer,
-            request,
-            pk
-        )
+        return self.add_to_recipe_list(
+            ShoppingCart, request, pk, 'Рецепт уже добавлен в список покупок')
 
     @shopping_cart.mapping.delete
     def delete_shopping_cart(self, request, pk):
-        get_object_or_404(
-            ShoppingCart,
-            user=request.user.id,
-            recipe=get_object_or_404(Recipe, pk=pk)
-        ).delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        return self.remove_from_recipe_list(
+            ShoppingCart, request, int(pk), 'Рецепта нет в списке покупок')
+
+    @staticmethod
+    def bulk_recipes(model, request):
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        if request.method == 'DELETE':
+            results = remove_relations(model, 'recipe', request.user.id, ids)
+        else:
+            results = add_relations(
+                model, 'recipe', request.user.id, ids,
+                set(Recipe.objects.filter(
+                    pk__in=ids).values_list('pk', flat=True))
+            )
+        return Response({'results': results})
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='favorite/bulk',
+        url_name='favorite_bulk',
+        permission_classes=(permissions.IsAuthenticated,)
+    )
+    def favorite_bulk(self, request):
+        return self.bulk_recipes(Favorite, request)
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='shopping_cart/bulk',
+        url_name='shopping_cart_bulk',
+        permission_classes=(permissions.IsAuthenticated,)
+    )
+    def shopping_cart_bulk(self, request):
+        return self.bulk_recipes(ShoppingCart, request)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=(permissions.IsAuthenticated,),
+        pagination_class=FeedPagination
+    )
+    def feed(self, request):
+        entries = self.paginator.paginate_feed(
+            lambda after, limit: FeedEntry.objects.page(
+                request.user.id, after, limit),
+            request
+        )
+        recipes = self.get_queryset().in_bulk(
+            [entry.recipe_id for entry in entries])
+        serializer = self.get_serializer(
+            [recipes[entry.recipe_id] for entry in entries
+             if entry.recipe_id in recipes],
+            many=True
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=True,
+        methods=['get'],
+        pagination_class=None
+    )
+    def similar(self, request, pk):
+        recipes = Recipe.objects.filter(
+            similar_to__recipe_id=pk
+        ).order_by('-similar_to__score', 'similar_to__similar_id')
+        serializer = RecipeToRepresentationSerializer(
+            recipes, many=True, context=self.get_serializer_context())
+        if not serializer.data and not Recipe.objects.filter(pk=pk).exists():
+            raise NotFound
+        return Response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='what_to_cook',
+        url_name='what_to_cook',
+        pagination_class=RankedPagination
+    )
+    def what_to_cook(self, request):
+        serializer = PantrySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids, missing = recipe_ingredient_index.rank(
+            serializer.validated_data['ingredients'])
+        page = self.paginate_queryset(range(len(recipe_ids)))
+        page_ids = recipe_ids[page].tolist()
+        recipes = self.get_queryset().in_bulk(page_ids)
+        for recipe_id, missing_count in zip(
+                page_ids, missing[page].tolist()):
+            if recipe_id in recipes:
+                recipes[recipe_id].missing_count = missing_count
+        return self.get_paginated_response(RecipeCoverageSerializer(
+            [recipes[pk] for pk in page_ids if pk in recipes],
+            many=True,
+            context=self.get_serializer_context()
+        ).data)
 
     @action(
         detail=False,
         methods=['get'],
         url_path='download_shopping_cart',
         url_name='download_shopping_cart',
-        permission_classes=(permissions.IsAuthenticated,)
+        permission_classes=(permissions.IsAuthenticated,),
+        renderer_classes=SHOPPING_LIST_RENDERERS
     )
     def download_shopping_cart(self, request):
-
-        if not ShoppingCart.objects.filter(user=request.user).exists():
+        ingredients = ShoppingListItem.objects.filter(
+            user=request.user
+        ).values(
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit'),
+            amount=F('total_amount')
+        ).order_by('name').iterator()
+        first = next(ingredients, None)
+        if first is None:
             return Response(
                 {'Ошибка': 'Ваш список покупок пуст'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        ingredients = IngredientInRecipe.objects.filter(
-            recipe__shopping_carts__user=request.user).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(amount=Sum('amount')).order_by('ingredient__name')
-        return self.send_message(ingredients)
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(chain((first,), ingredients)),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename=shopping_list.{renderer.format}'
+        )
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        renderer = getattr(request, 'accepted_renderer', None)
+        if (isinstance(response, Response)
+                and response.status_code >= status.HTTP_400_BAD_REQUEST
+                and (renderer is None
+                     or isinstance(renderer, ShoppingListRenderer))):
+            request.accepted_renderer = JSONRenderer()
+            request.accepted_media_type = JSONRenderer.media_type
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.is_anonymous:
+            return self.queryset.select_related('author')
+        return self.queryset.prefetch_related(
+            Prefetch('author', queryset=User.objects.annotate(
+                is_subscribed=Exists(Subscribe.objects.filter(
+                    user=user, author=OuterRef('pk')))
+            ))
+        ).annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+        )
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
@@ -127,30 +278,75 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return RecipeCreateSerializer
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(ReferenceCacheMixin, ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
     pagination_class = None
+    reference_cache = tags_cache
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(ReferenceCacheMixin, ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
+    reference_cache = ingredients_cache
     permission_classes = (AllowAny,)
     serializer_class = IngredientSerializer
     pagination_class = None
-    filter_backends = (IngredientFilter,)
-    search_fields = ('^name',)
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name', '').strip()
+        if not name:
+            return super().list(request, *args, **kwargs)
+        return self.cached_response(
+            lambda *args, **kwargs: Response(search_ingredients(name)),
+            request, *args, **kwargs
+        )
 
 
 class SubscriptionsListView(ListAPIView):
     serializer_class = SubscribeGetSerializer
     permission_classes = [IsAuthenticated, ]
     pagination_class = PageLimitPagination
+    cursor_ordering = ('username', 'id')
     queryset = Subscribe.objects.all()
 
     def get_queryset(self):
-        return User.objects.filter(author__user=self.request.user)
+        return User.objects.filter(
+            author__user=self.request.user
+        ).annotate(
+            is_subscribed=Value(True, output_field=BooleanField())
+        )
+
+    def get_recipes_limit(self):
+        limit = self.request.query_params.get('recipes_limit')
+        if not limit:
+            return None
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = -1
+        if limit < 0:
+            raise ValidationError(
+                {'recipes_limit': 'Значение параметра должно быть int.'}
+            )
+        return limit
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['recipes_limit'] = self.recipes_limit
+        return context
+
+    def list(self, request, *args, **kwargs):
+        self.recipes_limit = self.get_recipes_limit()
+        authors = self.paginate_queryset(self.get_queryset())
+        recipes = {author.id: [] for author in authors}
+        for recipe in Recipe.objects.latest_by_author(
+                recipes, self.recipes_limit):
+            recipes[recipe.author_id].append(recipe)
+        for author in authors:
+            author.latest_recipes = recipes[author.id]
+        serializer = self.get_serializer(authors, many=True)
+        return self.get_paginated_response(serializer.data)
 
 
 class SubscribeAPIView(APIView):
@@ -177,3 +373,24 @@ class SubscribeAPIView(APIView):
 
         subscription.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class SubscribeBulkAPIView(APIView):
+    permission_classes = [IsAuthenticated, ]
+
+    def get_ids(self, request):
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data['ids']
+
+    def post(self, request):
+        ids = self.get_ids(request)
+        return Response({'results': add_relations(
+            Subscribe, 'author', request.user.id, ids,
+            set(User.objects.filter(pk__in=ids).values_list('pk', flat=True)),
+            invalid_ids={request.user.id}
+        )})
+
+    def delete(self, request):
+        return Response({'results': remove_relations(
+            Subscribe, 'author', request.user.id, self.get_ids(request))})
@@ -0,0 +1,210 @@
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import django
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = Path(__file__).resolve().parent / 'baseline.json'
+PERCENTILES = (50, 95, 99)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Нагрузочный прогон основных эндпоинтов API.')
+    parser.add_argument('--iterations', type=int, default=50,
+                        help='Запросов к каждому эндпоинту.')
+    parser.add_argument('--warmup', type=int, default=5,
+                        help='Прогревочных запросов перед замером.')
+    parser.add_argument('--email',
+                        help='Пользователь, от имени которого идут запросы.')
+    parser.add_argument('--base-url',
+                        help='Адрес запущенного сервера, например '
+                             'http://localhost:8000. По умолчанию запросы '
+                             'идут через тестовый клиент Django.')
+    parser.add_argument('--only', nargs='*', default=(),
+                        help='Замерять только указанные эндпоинты.')
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE,
+                        help='Файл с базовыми результатами.')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Сохранить результаты как базовые.')
+    parser.add_argument('--output', type=Path,
+                        help='Сохранить результаты в JSON.')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Допустимый рост p95 относительно базового.')
+    return parser.parse_args()
+
+
+def setup_django():
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+    django.setup()
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+
+
+def get_user(email):
+    from users.models import User
+    if email:
+        return User.objects.get(email=email)
+    user = User.objects.filter(
+        shopping_list__isnull=False,
+        follower__isnull=False
+    ).order_by('-id').first()
+    if user is None:
+        sys.exit('Нет пользователя со списком покупок и подписками: '
+                 'запустите manage.py seed_data.')
+    return user
+
+
+def get_endpoints(user):
+    from recipes.models import Ingredient, Recipe, Tag
+    slugs = list(Tag.objects.order_by('id').values_list('slug', flat=True))
+    recipe = Recipe.objects.order_by('-pub_date', '-id').first()
+    ingredient = Ingredient.objects.order_by('id').first()
+    if recipe is None or ingredient is None or len(slugs) < 2:
+        sys.exit('В базе недостаточно данных: '
+                 'запустите manage.py seed_data.')
+    tags = f'tags={slugs[0]}&tags={slugs[1]}'
+    return {
+        'recipes': '/api/recipes/',
+        'recipes_page_5': '/api/recipes/?page=5',
+        'recipes_cursor': '/api/recipes/?cursor=',
+        'recipes_tags_any': f'/api/recipes/?{tags}',
+        'recipes_tags_all': f'/api/recipes/?{tags}&tags_mode=all',
+        'recipes_author': f'/api/recipes/?author={recipe.author_id}',
+        'recipes_favorited': '/api/recipes/?is_favorited=1',
+        'recipes_in_cart': '/api/recipes/?is_in_shopping_cart=1',
+        'recipes_all_filters': (
+            f'/api/recipes/?{tags}&author={user.id}'
+            '&is_favorited=1&is_in_shopping_cart=1'),
+        'recipe_detail': f'/api/recipes/{recipe.id}/',
+        'subscriptions': '/api/users/subscriptions/?recipes_limit=3',
+        'download_shopping_cart': '/api/recipes/download_shopping_cart/',
+        'ingredient_search': (
+            f'/api/ingredients/?name={ingredient.name[:2]}'),
+    }
+
+
+def local_client(token):
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+    client = Client(HTTP_AUTHORIZATION=f'Token {token}')
+
+    def request(url):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+            b''.join(getattr(response, 'streaming_content', ()))
+        return response.status_code, len(queries)
+    return request
+
+
+def remote_client(base_url, token):
+    import requests
+    session = requests.Session()
+    session.headers['Authorization'] = f'Token {token}'
+
+    def request(url):
+        response = session.get(base_url.rstrip('/') + url)
+        return response.status_code, None
+    return request
+
+
+def percentile(values, rank):
+    values = sorted(values)
+    index = max(0, -(-len(values) * rank // 100) - 1)
+    return values[index]
+
+
+def measure(request, url, iterations, warmup):
+    for _ in range(warmup):
+        request(url)
+    durations = []
+    queries = set()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        start = time.perf_counter()
+        status, count = request(url)
+        durations.append((time.perf_counter() - start) * 1000)
+        if status != 200:
+            sys.exit(f'{url}: ответ {status}.')
+        queries.add(count)
+    total = time.perf_counter() - started
+    result = {
+        f'p{rank}': round(percentile(durations, rank), 2)
+        for rank in PERCENTILES
+    }
+    result['rps'] = round(iterations / total, 1)
+    result['queries'] = None if None in queries else max(queries)
+    return result
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['p95'] > base['p95'] * (1 + tolerance):
+            regressions.append(
+                f'{name}: p95 {result["p95"]} мс, '
+                f'базовое значение {base["p95"]} мс')
+        if (None not in (result['queries'], base.get('queries'))
+                and result['queries'] > base['queries']):
+            regressions.append(
+                f'{name}: {result["queries"]} запросов к БД, '
+                f'базовое значение {base["queries"]}')
+    return regressions
+
+
+def print_table(results):
+    header = ('endpoint', 'p50, мс', 'p95, мс', 'p99, мс', 'rps', 'queries')
+    print('{:<24}{:>10}{:>10}{:>10}{:>10}{:>9}'.format(*header))
+    for name, result in results.items():
+        print('{:<24}{:>10}{:>10}{:>10}{:>10}{:>9}'.format(
+            name, result['p50'], result['p95'], result['p99'],
+            result['rps'], '-' if result['queries'] is None
+            else result['queries']))
+
+
+def main():
+    args = parse_args()
+    setup_django()
+    from rest_framework.authtoken.models import Token
+    user = get_user(args.email)
+    token = Token.objects.get_or_create(user=user)[0].key
+    if args.base_url:
+        request = remote_client(args.base_url, token)
+    else:
+        request = local_client(token)
+    endpoints = get_endpoints(user)
+    results = {}
+    for name, url in endpoints.items():
+        if args.only and name not in args.only:
+            continue
+        results[name] = measure(request, url, args.iterations, args.warmup)
+    print_table(results)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2))
+        print(f'Базовые результаты сохранены в {args.baseline}')
+        return
+    if not args.baseline.exists():
+        print(f'Файл {args.baseline} не найден, сравнение пропущено.')
+        return
+    regressions = compare(
+        results, json.loads(args.baseline.read_text()), args.tolerance)
+    for regression in regressions:
+        print(f'Регрессия: {regression}')
+    if regressions:
+        sys.exit(1)
+    print('Регрессий относительно базовых результатов нет.')
+
+
+if __name__ == '__main__':
+    main()
@@ -29,6 +29,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,6 +82,60 @@ else:
         }
     }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+    }
+}
+
+REFERENCE_CACHE_TIMEOUT = int(
+    os.getenv('REFERENCE_CACHE_TIMEOUT', default=60 * 60))
+REFERENCE_CACHE_LOCAL_TTL = int(
+    os.getenv('REFERENCE_CACHE_LOCAL_TTL', default=30))
+REFERENCE_CACHE_LOCAL_SIZE = 1024
+
+TOKEN_CACHE_TIMEOUT = int(os.getenv('TOKEN_CACHE_TIMEOUT', default=5 * 60))
+TOKEN_CACHE_LOCAL_TTL = int(os.getenv('TOKEN_CACHE_LOCAL_TTL', default=5))
+TOKEN_CACHE_LOCAL_SIZE = 10000
+
+FEED_FANOUT_MAX_FOLLOWERS = int(
+    os.getenv('FEED_FANOUT_MAX_FOLLOWERS', default=1000))
+
+IMAGE_RENDITION_WORKERS = int(
+    os.getenv('IMAGE_RENDITION_WORKERS', default=2))
+BASE64_DECODE_CHUNK_SIZE = 64 * 1024
+
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+REQUEST_METRICS = os.getenv('REQUEST_METRICS', default='False') == 'True'
+REQUEST_METRICS_ENDPOINT = (
+    os.getenv('REQUEST_METRICS_ENDPOINT', default='False') == 'True')
+REQUEST_METRICS_ALLOWED_NETWORKS = os.getenv(
+    'REQUEST_METRICS_ALLOWED_NETWORKS', default='127.0.0.1/32').split(',')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'api.metrics': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -118,7 +173,7 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
 }
 
@@ -1,7 +1,18 @@
 from django.contrib import admin
 
 from .models import (Favorite, Ingredient, IngredientInRecipe, Recipe,
-                     ShoppingCart, Tag)
+                     ShoppingCart, ShoppingListItem, Tag)
+
+
+class ReadOnlyAdmin(admin.ModelAdmin):
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 
 class IngredientAdmin(admin.ModelAdmin):
@@ -25,21 +36,29 @@ class RecipeAdmin(admin.ModelAdmin):
         'name',
         'author',
         'ingredient_list',
-        'favorite_count',
+        'favorites_count',
+        'in_carts_count',
     )
+    readonly_fields = ('favorites_count', 'in_carts_count')
     list_filter = ('name', 'author', 'tags',)
 
+    @staticmethod
+    def amounts(recipe):
+        return dict(recipe.ingredient.values_list('ingredient_id', 'amount'))
+
+    def save_related(self, request, form, formsets, change):
+        recipe = form.instance
+        old_amounts = self.amounts(recipe) if change else {}
+        super().save_related(request, form, formsets, change)
+        ShoppingListItem.objects.apply_recipe_change(
+            recipe.id, old_amounts, self.amounts(recipe))
+
     def ingredient_list(self, obj):
         return ', '.join([str(ingredient) for ingredient
                           in obj.ingredients.all()])
 
     ingredient_list.short_description = 'Ингредиенты'
 
-    def favorite_count(self, obj):
-        return obj.favorite.count()
-
-    favorite_count.short_description = 'Количество добавлений в Избранное'
-
 
 class TagAdmin(admin.ModelAdmin):
     list_display = (
@@ -59,7 +78,7 @@ class FavoriteAdmin(admin.ModelAdmin):
     list_filter = ('user',)
 
 
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(ReadOnlyAdmin):
     list_display = (
         'user',
         'recipe',
@@ -67,8 +86,18 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     list_filter = ('user',)
 
 
+class ShoppingListItemAdmin(ReadOnlyAdmin):
+    list_display = (
+        'user',
+        'ingredient',
+        'total_amount',
+    )
+    list_filter = ('user',)
+
+
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(Recipe, RecipeAdmin)
 admin.site.register(Tag, TagAdmin)
 admin.site.register(Favorite, FavoriteAdmin)
 admin.site.register(ShoppingCart, ShoppingCartAdmin)
+admin.site.register(ShoppingListItem, ShoppingListItemAdmin)
@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class RecipesConfig(AppConfig):
     name = 'recipes'
     verbose_name = 'Рецепты'
+
+    def ready(self):
+        from recipes import signals  # noqa: F401
+        from recipes.search import ensure_sqlite_triggers
+        post_migrate.connect(ensure_sqlite_triggers, sender=self)
@@ -5,3 +5,7 @@ LENGTH_OF_HEX_FIELD = 7
 LENGTH_OF_MIN_VALUE = 1
 LENGTH_OF_MAX_TIME = 1500
 LENGTH_OF_MAX_AMOUNT = 5500
+BULK_MAX_ITEMS = 100
+FEED_BACKFILL_SIZE = 50
+FEED_BATCH_SIZE = 1000
+SIMILAR_RECIPES_COUNT = 10
@@ -0,0 +1,53 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscribe, User
+
+COUNTERS = {
+    Recipe: {
+        'favorites_count': (Favorite, 'recipe'),
+        'in_carts_count': (ShoppingCart, 'recipe'),
+    },
+    User: {
+        'recipes_count': (Recipe, 'author'),
+        'followers_count': (Subscribe, 'author'),
+    },
+}
+
+
+def change_counters(model, pks, field, delta):
+    queryset = model.objects.filter(pk__in=pks)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def change_counter(model, pk, field, delta):
+    return change_counters(model, [pk], field, delta)
+
+
+def actual_count(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            count=Count('pk')
+        ).values('count')
+    ), 0)
+
+
+def refresh_counters(model, queryset=None, fields=None):
+    if queryset is None:
+        queryset = model.objects.all()
+    counters = COUNTERS[model]
+    return queryset.update(**{
+        name: actual_count(*counters[name])
+        for name in (fields or counters)
+    })
+
+
+def stale_counters(model, name):
+    return model.objects.annotate(
+        actual=actual_count(*COUNTERS[model][name])
+    ).exclude(**{name: F('actual')})
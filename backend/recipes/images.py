@@ -0,0 +1,74 @@
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS = {
+    'thumbnail': (320, 320),
+    'card': (800, 800),
+    'full': (1600, 1600),
+}
+RENDITION_FORMAT = 'WEBP'
+RENDITION_QUALITY = 80
+
+executor = ThreadPoolExecutor(
+    max_workers=max(settings.IMAGE_RENDITION_WORKERS, 1),
+    thread_name_prefix='renditions'
+)
+
+
+def rendition_name(source, name):
+    path = PurePosixPath(source)
+    return str(path.parent / 'renditions' / f'{path.stem}_{name}.webp')
+
+
+def encode_rendition(image, size):
+    image = image.copy()
+    image.thumbnail(size, Image.LANCZOS)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, RENDITION_FORMAT, quality=RENDITION_QUALITY, method=4)
+    return ContentFile(buffer.getvalue())
+
+
+def build_renditions(recipe_id, source):
+    from recipes.models import Recipe
+    try:
+        with default_storage.open(source) as file:
+            image = ImageOps.exif_transpose(Image.open(file))
+            image.load()
+        renditions = {'source': source}
+        for name, size in RENDITIONS.items():
+            path = rendition_name(source, name)
+            if default_storage.exists(path):
+                default_storage.delete(path)
+            renditions[name] = default_storage.save(
+                path, encode_rendition(image, size))
+        Recipe.objects.filter(
+            pk=recipe_id, image=source).update(renditions=renditions)
+    except Exception:
+        logger.exception(
+            'Не удалось подготовить изображения рецепта %s', recipe_id)
+    finally:
+        if settings.IMAGE_RENDITION_WORKERS:
+            connection.close()
+
+
+def schedule_renditions(recipe):
+    if not recipe.image or recipe.renditions.get('source') == recipe.image.name:
+        return
+    recipe_id, source = recipe.id, recipe.image.name
+    if not settings.IMAGE_RENDITION_WORKERS:
+        transaction.on_commit(lambda: build_renditions(recipe_id, source))
+        return
+    transaction.on_commit(
+        lambda: executor.submit(build_renditions, recipe_id, source))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import build_renditions
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Команда build_renditions готовит уменьшенные копии изображений '
+            'рецептов, у которых их ещё нет.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Пересоздать копии для всех рецептов.'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').exclude(image__isnull=True)
+        processed = 0
+        for recipe_id, image, renditions in recipes.values_list(
+                'id', 'image', 'renditions').iterator():
+            if not options['force'] and renditions.get('source') == image:
+                continue
+            build_renditions(recipe_id, image)
+            processed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано рецептов: {processed}'))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from recipes import constants
+from recipes.similarity import update_similar_recipes
+
+
+class Command(BaseCommand):
+    help = ('Команда build_similar_recipes пересчитывает похожие рецепты '
+            'по ингредиентам и тегам для новых и изменённых рецептов и '
+            'для рецептов, у которых они могут оказаться среди похожих.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help=('Пересчитать похожие рецепты для всех рецептов '
+                  '(учитывает в том числе удалённые рецепты).')
+        )
+        parser.add_argument(
+            '--count',
+            type=int,
+            default=constants.SIMILAR_RECIPES_COUNT,
+            help='Сколько похожих рецептов сохранять для каждого рецепта.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько рецептов обрабатывать за один шаг.'
+        )
+        parser.add_argument(
+            '--max-df',
+            type=float,
+            default=0.2,
+            help=('Не учитывать ингредиенты и теги, которые встречаются '
+                  'в большей доле рецептов.')
+        )
+
+    def handle(self, *args, **options):
+        processed = update_similar_recipes(
+            options['all'], options['count'], options['batch_size'],
+            options['max_df'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано рецептов: {processed}'))
@@ -0,0 +1,117 @@
+import re
+from itertools import combinations
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from rest_framework.test import APIRequestFactory
+
+from api.filters import RecipeFilter
+from api.views import RecipeViewSet
+from recipes.models import Recipe, Tag
+from users.models import User
+
+SEQUENTIAL_SCAN = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(
+        r'\bSCAN (?:TABLE )?(\w+)(?!.*\b(?:USING|VIRTUAL TABLE INDEX)\b)'),
+}
+
+
+class Command(BaseCommand):
+    help = ('Команда check_query_plans выполняет EXPLAIN для всех '
+            'комбинаций фильтров списка рецептов и сообщает о полном '
+            'сканировании больших таблиц.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-rows',
+            type=int,
+            default=1000,
+            help='Таблицы меньшего размера не проверяются.'
+        )
+        parser.add_argument(
+            '--user',
+            type=int,
+            help='Пользователь, от имени которого строятся запросы.'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=6,
+            help='Размер страницы.'
+        )
+
+    def handle(self, *args, **options):
+        pattern = SEQUENTIAL_SCAN.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(
+                f'База данных {connection.vendor} не поддерживается.')
+        user = self.get_user(options['user'])
+        slugs = list(Tag.objects.values_list('slug', flat=True)[:2])
+        name = Recipe.objects.values_list('name', flat=True).first() or ''
+        filters = {
+            'tags': [('tags', slug) for slug in slugs],
+            'tags_mode': [('tags_mode', 'all')],
+            'author': [('author', user.id)],
+            'is_favorited': [('is_favorited', 1)],
+            'is_in_shopping_cart': [('is_in_shopping_cart', 1)],
+            'search': [('search', name.split(' ')[0])],
+        }
+        sizes = {}
+        known_tables = set(connection.introspection.table_names())
+        failures = []
+        for size in range(len(filters) + 1):
+            for names in combinations(filters, size):
+                params = [pair for name in names for pair in filters[name]]
+                plan = self.explain(user, params, options['limit'])
+                tables = {
+                    table for table in pattern.findall(plan)
+                    if table in known_tables
+                    and self.table_size(table, sizes) >= options['min_rows']
+                }
+                label = ', '.join(names) or 'без фильтров'
+                if tables:
+                    failures.append(label)
+                    self.stdout.write(self.style.ERROR(
+                        f'{label}: полное сканирование {", ".join(tables)}'))
+                    if options['verbosity'] > 1:
+                        self.stdout.write(plan)
+                else:
+                    self.stdout.write(f'{label}: OK')
+        if failures:
+            raise CommandError(
+                f'Полное сканирование больших таблиц в {len(failures)} '
+                f'запросах.')
+        self.stdout.write(self.style.SUCCESS('Планы запросов в порядке'))
+
+    @staticmethod
+    def get_user(user_id):
+        users = User.objects.all()
+        if user_id is not None:
+            users = users.filter(pk=user_id)
+        user = users.annotate(
+            favorites=Count('favorite')
+        ).order_by('-favorites').first()
+        if user is None:
+            raise CommandError('Нет пользователя для построения запросов.')
+        return user
+
+    @staticmethod
+    def explain(user, params, limit):
+        request = APIRequestFactory().get('/api/recipes/', params)
+        request.user = user
+        view = RecipeViewSet(request=request, action='list', kwargs={})
+        queryset = RecipeFilter(
+            request.GET, queryset=view.get_queryset(), request=request
+        ).qs
+        return queryset[:limit].explain()
+
+    @staticmethod
+    def table_size(table, sizes):
+        if table not in sizes:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}')
+                sizes[table] = cursor.fetchone()[0]
+        return sizes[table]
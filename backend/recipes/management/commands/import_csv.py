@@ -1,49 +1,162 @@
 import csv
+import json
+import re
+from itertools import chain, islice
 from pathlib import Path
 
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
+from api.cache import ingredients_cache, tags_cache
 from recipes.models import Ingredient, Tag
 
+DATA_DIR = Path(settings.BASE_DIR) / 'data'
+JSON_CHUNK_SIZE = 64 * 1024
+SEPARATOR = re.compile(r'[\s,]*')
+
+
+def read_csv(path, fields):
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        for line, row in enumerate(csv.reader(file, delimiter=','), 1):
+            if not row:
+                continue
+            if len(row) != len(fields):
+                raise CommandError(
+                    f'{path}, строка {line}: ожидалось {len(fields)} '
+                    f'значения, получено {len(row)}.')
+            yield dict(zip(fields, (value.strip() for value in row)))
+
+
+def read_json(path, fields):
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as file:
+        buffer = file.read(JSON_CHUNK_SIZE).lstrip()
+        if not buffer.startswith('['):
+            raise CommandError(f'{path}: ожидался JSON-массив объектов.')
+        position = 1
+        while True:
+            position = SEPARATOR.match(buffer, position).end()
+            if buffer.startswith(']', position):
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                chunk = file.read(JSON_CHUNK_SIZE)
+                if not chunk:
+                    raise CommandError(f'{path}: некорректный JSON.')
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            try:
+                yield {field: str(item[field]).strip() for field in fields}
+            except (KeyError, TypeError):
+                raise CommandError(
+                    f'{path}: у объекта {item} нет полей {fields}.')
+
+
+def read_rows(path, fields):
+    path = Path(path)
+    if not path.exists():
+        raise CommandError(f'Файл {path} не существует.')
+    if path.suffix == '.json':
+        return read_json(path, fields)
+    return read_csv(path, fields)
+
+
+def unique(rows, key_fields):
+    seen = set()
+    for row in rows:
+        key = tuple(row[field] for field in key_fields)
+        if key not in seen:
+            seen.add(key)
+            yield row
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
 
 class Command(BaseCommand):
-    help = 'Команда import_csv добавляет данные в базу данных из csv файлов.'
+    help = ('Команда import_csv добавляет ингредиенты и теги в базу данных '
+            'из csv или json файлов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            nargs='+',
+            default=[DATA_DIR / 'ingredients.csv'],
+            help='Файлы с ингредиентами (.csv или .json).'
+        )
+        parser.add_argument(
+            '--tags-path',
+            nargs='*',
+            default=[DATA_DIR / 'tags.csv'],
+            help='Файлы с тегами (.csv или .json).'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество записей в одном INSERT.'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Прочитать файлы и откатить изменения в конце.'
+        )
 
     def handle(self, *args, **options):
-        csv_ingredients = Path(settings.BASE_DIR) / 'data' / 'ingredients.csv'
-        csv_tags = Path(settings.BASE_DIR) / 'data' / 'tags.csv'
-        if not csv_ingredients.exists():
-            raise CommandError('Файл csv_ingredients не существует.')
-
-        with open(csv_ingredients, 'r', encoding='utf-8') as ing_file:
-            reader = csv.reader(ing_file, delimiter=',')
-            for name, measurement_unit in reader:
-                ingredient, created = Ingredient.objects.get_or_create(
-                    name=name,
-                    measurement_unit=measurement_unit
-                )
-
-                if not created:
-                    self.stdout.write(self.style.WARNING(
-                        f'Ингредиент {ingredient.name} уже существует.'))
-            self.stdout.write(
-                self.style.SUCCESS('Ингредиенты успешно загружены'))
-
-        if not csv_tags.exists():
-            raise CommandError('Файл csv_tags не существует.')
-
-        with open(csv_tags, 'r', encoding='utf-8') as ing_file:
-            reader = csv.reader(ing_file, delimiter=',')
-            for name, slug, color in reader:
-                tag, created = Tag.objects.get_or_create(
-                    name=name,
-                    slug=slug,
-                    color=color
-                )
-
-                if not created:
-                    self.stdout.write(self.style.WARNING(
-                        f'Тег {tag.name} уже существует.'))
-            self.stdout.write(
-                self.style.SUCCESS('Теги успешно загружены'))
+        self.verbosity = options['verbosity']
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля.')
+        with transaction.atomic():
+            self.load(
+                Ingredient,
+                options['path'],
+                ('name', 'measurement_unit'),
+                ('name', 'measurement_unit'),
+                options['batch_size'],
+                'Ингредиенты'
+            )
+            self.load(
+                Tag,
+                options['tags_path'],
+                ('name', 'slug', 'color'),
+                ('name',),
+                options['batch_size'],
+                'Теги'
+            )
+            if options['dry_run']:
+                transaction.set_rollback(True)
+                self.stdout.write(self.style.WARNING(
+                    'Пробный запуск: изменения не сохранены.'))
+                return
+        ingredients_cache.invalidate()
+        tags_cache.invalidate()
+
+    def load(self, model, paths, fields, key_fields, batch_size, title):
+        before = model.objects.count()
+        processed = 0
+        rows = unique(
+            chain.from_iterable(read_rows(path, fields) for path in paths),
+            key_fields
+        )
+        for batch in batches(rows, batch_size):
+            model.objects.bulk_create(
+                (model(**row) for row in batch),
+                batch_size=batch_size,
+                ignore_conflicts=True
+            )
+            processed += len(batch)
+            if self.verbosity > 1:
+                self.stdout.write(f'{title}: обработано {processed}')
+        created = model.objects.count() - before
+        self.stdout.write(self.style.SUCCESS(
+            f'{title} успешно загружены: добавлено {created}, '
+            f'уже существовало {processed - created}.'))
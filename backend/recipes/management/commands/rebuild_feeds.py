@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import FeedEntry
+
+
+class Command(BaseCommand):
+    help = ('Команда rebuild_feeds заново заполняет ленты подписок '
+            'пользователей последними рецептами их авторов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            nargs='+',
+            dest='user_ids',
+            help='Ограничить обработку указанными пользователями.'
+        )
+
+    def handle(self, *args, **options):
+        FeedEntry.objects.rebuild(options['user_ids'])
+        self.stdout.write(self.style.SUCCESS('Ленты подписок пересобраны'))
@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = ('Команда rebuild_shopping_lists пересчитывает или проверяет '
+            'агрегированные списки покупок пользователей.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только проверить списки покупок, не изменяя их.'
+        )
+        parser.add_argument(
+            '--user',
+            type=int,
+            nargs='+',
+            dest='user_ids',
+            help='Ограничить обработку указанными пользователями.'
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+        if not options['verify']:
+            ShoppingListItem.objects.rebuild(user_ids)
+            self.stdout.write(
+                self.style.SUCCESS('Списки покупок успешно пересчитаны'))
+            return
+
+        queryset = ShoppingListItem.objects.all()
+        if user_ids is not None:
+            queryset = queryset.filter(user_id__in=user_ids)
+        actual = {
+            (user_id, ingredient_id): total_amount
+            for user_id, ingredient_id, total_amount in queryset.values_list(
+                'user_id', 'ingredient_id', 'total_amount').iterator()
+        }
+        expected = ShoppingListItem.objects.expected(user_ids)
+        mismatches = 0
+        for key in sorted(actual.keys() | expected.keys()):
+            if actual.get(key) != expected.get(key):
+                mismatches += 1
+                self.stdout.write(self.style.WARNING(
+                    f'Пользователь {key[0]}, ингредиент {key[1]}: '
+                    f'ожидалось {expected.get(key)}, '
+                    f'сохранено {actual.get(key)}.'
+                ))
+        if mismatches:
+            raise CommandError(
+                f'Найдено расхождений в списках покупок: {mismatches}.')
+        self.stdout.write(
+            self.style.SUCCESS('Списки покупок совпадают с корзинами'))
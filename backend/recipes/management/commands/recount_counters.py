@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from recipes.counters import COUNTERS, refresh_counters, stale_counters
+
+
+class Command(BaseCommand):
+    help = ('Команда recount_counters сверяет счётчики избранного, '
+            'списков покупок, рецептов и подписчиков с данными в базе.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только показать расхождения, не исправляя их.'
+        )
+
+    def handle(self, *args, **options):
+        for model, counters in COUNTERS.items():
+            for name in counters:
+                stale = stale_counters(model, name)
+                count = stale.count()
+                if not count:
+                    continue
+                self.stdout.write(self.style.WARNING(
+                    f'{model._meta.verbose_name_plural}: {name} '
+                    f'расходится у {count} записей.'))
+                if not options['check']:
+                    refresh_counters(
+                        model,
+                        model.objects.filter(pk__in=stale.values('pk')),
+                        (name,)
+                    )
+        self.stdout.write(self.style.SUCCESS('Сверка счётчиков завершена'))
@@ -0,0 +1,172 @@
+import io
+import random
+import uuid
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from PIL import Image
+
+from api.cache import ingredients_cache, tags_cache
+from api.pantry import recipe_ingredient_index
+from recipes.counters import refresh_counters
+from recipes.models import (Favorite, FeedEntry, Ingredient,
+                            IngredientInRecipe, Recipe, ShoppingCart,
+                            ShoppingListItem, Tag)
+from users.models import Subscribe, User
+
+SEED_IMAGE = 'recipes/images/seed.png'
+TAG_COLORS = ('#E26C2D', '#49B64E', '#8775D2', '#F4C430', '#4A90E2')
+
+
+class Command(BaseCommand):
+    help = ('Команда seed_data заполняет базу синтетическими пользователями, '
+            'рецептами, избранным, списками покупок и подписками '
+            'для нагрузочного тестирования.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100,
+                            help='Количество пользователей.')
+        parser.add_argument('--recipes', type=int, default=1000,
+                            help='Количество рецептов.')
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8,
+                            help='Ингредиентов в одном рецепте.')
+        parser.add_argument('--tags-per-recipe', type=int, default=2,
+                            help='Тегов у одного рецепта.')
+        parser.add_argument('--favorites', type=int, default=20,
+                            help='Рецептов в избранном у пользователя.')
+        parser.add_argument('--carts', type=int, default=5,
+                            help='Рецептов в списке покупок у пользователя.')
+        parser.add_argument('--subscriptions', type=int, default=10,
+                            help='Подписок у пользователя.')
+        parser.add_argument('--min-ingredients', type=int, default=500,
+                            help='Недостающие ингредиенты будут созданы.')
+        parser.add_argument('--min-tags', type=int, default=3,
+                            help='Недостающие теги будут созданы.')
+        parser.add_argument('--password', default='password',
+                            help='Пароль созданных пользователей.')
+        parser.add_argument('--seed', type=int,
+                            help='Начальное значение генератора.')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Количество записей в одном INSERT.')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['batch_size'] < 1:
+            raise CommandError(
+                '--users и --batch-size должны быть больше нуля.')
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.run = uuid.uuid4().hex[:8]
+        with transaction.atomic():
+            tag_ids = self.ensure(
+                Tag, options['min_tags'], self.make_tag)
+            ingredient_ids = self.ensure(
+                Ingredient, options['min_ingredients'], self.make_ingredient)
+            user_ids = self.create_users(
+                options['users'], options['password'])
+            recipe_ids = self.create_recipes(
+                user_ids, options['recipes'], tag_ids, ingredient_ids,
+                options['ingredients_per_recipe'], options['tags_per_recipe'])
+            for model, count in ((Favorite, options['favorites']),
+                                 (ShoppingCart, options['carts'])):
+                self.bulk_create(model, (
+                    model(user_id=user_id, recipe_id=recipe_id)
+                    for user_id in user_ids
+                    for recipe_id in self.sample(recipe_ids, count)
+                ))
+            self.bulk_create(Subscribe, (
+                Subscribe(user_id=user_id, author_id=author_id)
+                for user_id in user_ids
+                for author_id in self.sample(
+                    [pk for pk in user_ids if pk != user_id],
+                    options['subscriptions'])
+            ))
+            refresh_counters(User, User.objects.filter(pk__in=user_ids))
+            refresh_counters(Recipe, Recipe.objects.filter(pk__in=recipe_ids))
+            ShoppingListItem.objects.rebuild(user_ids)
+            FeedEntry.objects.rebuild(user_ids)
+        ingredients_cache.invalidate()
+        tags_cache.invalidate()
+        recipe_ingredient_index.invalidate()
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(user_ids)}, '
+            f'рецептов: {len(recipe_ids)}. '
+            f'Почта: seed-{self.run}-N@example.com, '
+            f'пароль: {options["password"]}.'))
+
+    def sample(self, population, count):
+        return self.random.sample(population, min(count, len(population)))
+
+    def bulk_create(self, model, objects):
+        model.objects.bulk_create(
+            objects, batch_size=self.batch_size, ignore_conflicts=True)
+
+    def ensure(self, model, minimum, factory):
+        missing = minimum - model.objects.count()
+        if missing > 0:
+            self.bulk_create(model, (factory(n) for n in range(missing)))
+        return list(model.objects.order_by('id').values_list('id', flat=True))
+
+    def make_tag(self, number):
+        return Tag(
+            name=f'Тег {self.run}-{number}',
+            slug=f'seed-{self.run}-{number}',
+            color=TAG_COLORS[number % len(TAG_COLORS)]
+        )
+
+    def make_ingredient(self, number):
+        return Ingredient(
+            name=f'Ингредиент {self.run}-{number}', measurement_unit='г')
+
+    def create_users(self, count, password):
+        password = make_password(password)
+        prefix = f'seed-{self.run}-'
+        self.bulk_create(User, (
+            User(
+                username=f'{prefix}{number}',
+                email=f'{prefix}{number}@example.com',
+                first_name='Тест',
+                last_name='Тестов',
+                password=password
+            ) for number in range(count)
+        ))
+        return list(User.objects.filter(
+            username__startswith=prefix
+        ).order_by('id').values_list('id', flat=True))
+
+    def create_recipes(self, user_ids, count, tag_ids, ingredient_ids,
+                       ingredients_per_recipe, tags_per_recipe):
+        if not default_storage.exists(SEED_IMAGE):
+            image = io.BytesIO()
+            Image.new('RGB', (1, 1), '#E26C2D').save(image, 'PNG')
+            default_storage.save(SEED_IMAGE, ContentFile(image.getvalue()))
+        self.bulk_create(Recipe, (
+            Recipe(
+                author_id=self.random.choice(user_ids),
+                name=f'Рецепт {self.run}-{number}',
+                image=SEED_IMAGE,
+                text='Синтетический рецепт для нагрузочного тестирования.',
+                cooking_time=self.random.randint(1, 180)
+            ) for number in range(count)
+        ))
+        recipe_ids = list(Recipe.objects.filter(
+            author_id__in=user_ids
+        ).order_by('id').values_list('id', flat=True))
+        self.bulk_create(IngredientInRecipe, (
+            IngredientInRecipe(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id,
+                amount=self.random.randint(1, 500)
+            )
+            for recipe_id in recipe_ids
+            for ingredient_id in self.sample(
+                ingredient_ids, ingredients_per_recipe)
+        ))
+        self.bulk_create(Recipe.tags.through, (
+            Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in recipe_ids
+            for tag_id in self.sample(tag_ids, tags_per_recipe)
+        ))
+        return recipe_ids
@@ -0,0 +1,48 @@
+# Generated by Django 3.2.18 on 2026-10-18 18:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_shopping_list(apps, schema_editor):
+    ingredient_in_recipe = apps.get_model('recipes', 'IngredientInRecipe')
+    shopping_list_item = apps.get_model('recipes', 'ShoppingListItem')
+    rows = ingredient_in_recipe.objects.values(
+        'ingredient_id',
+        user_id=models.F('recipe__shopping_carts__user_id')
+    ).filter(user_id__isnull=False).annotate(
+        total_amount=models.Sum('amount')
+    ).order_by()
+    shopping_list_item.objects.bulk_create(
+        shopping_list_item(**row) for row in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_amount', models.PositiveIntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list_items', to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Позиция списка покупок',
+                'verbose_name_plural': 'Позиции списка покупок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistitem',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_user_ingredient'),
+        ),
+        migrations.RunPython(fill_shopping_list, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 3.2.18 on 2026-10-18 18:53
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_by(model, field):
+    return Coalesce(models.Subquery(
+        model.objects.filter(
+            **{field: models.OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            count=models.Count('pk')
+        ).values('count')
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    recipe = apps.get_model('recipes', 'Recipe')
+    favorite = apps.get_model('recipes', 'Favorite')
+    shopping_cart = apps.get_model('recipes', 'ShoppingCart')
+    user = apps.get_model('users', 'User')
+    subscribe = apps.get_model('users', 'Subscribe')
+    recipe.objects.update(
+        favorites_count=count_by(favorite, 'recipe'),
+        in_carts_count=count_by(shopping_cart, 'recipe'),
+    )
+    user.objects.update(
+        recipes_count=count_by(recipe, 'author'),
+        followers_count=count_by(subscribe, 'author'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_ingredient_search_indexes'),
+        ('users', '0002_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество добавлений в избранное'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество добавлений в список покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
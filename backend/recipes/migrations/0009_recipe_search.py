@@ -0,0 +1,70 @@
+from django.db import migrations
+
+from recipes.search import SQLITE_REBUILD, SQLITE_TRIGGERS
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('russian', coalesce({row}.name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce({row}.text, '')), 'B')"
+)
+
+POSTGRESQL_FORWARD = (
+    'ALTER TABLE recipes_recipe ADD COLUMN IF NOT EXISTS search_vector '
+    'tsvector',
+    'CREATE OR REPLACE FUNCTION recipes_recipe_search_vector() '
+    'RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN '
+    f'NEW.search_vector := {SEARCH_VECTOR.format(row="NEW")}; '
+    'RETURN NEW; END $$',
+    'DROP TRIGGER IF EXISTS recipes_recipe_search_vector ON recipes_recipe',
+    'CREATE TRIGGER recipes_recipe_search_vector '
+    'BEFORE INSERT OR UPDATE OF name, text ON recipes_recipe '
+    'FOR EACH ROW EXECUTE FUNCTION recipes_recipe_search_vector()',
+    'UPDATE recipes_recipe SET search_vector = '
+    f'{SEARCH_VECTOR.format(row="recipes_recipe")}',
+    'CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector_gin '
+    'ON recipes_recipe USING gin (search_vector)',
+)
+POSTGRESQL_BACKWARD = (
+    'DROP INDEX IF EXISTS recipes_recipe_search_vector_gin',
+    'DROP TRIGGER IF EXISTS recipes_recipe_search_vector ON recipes_recipe',
+    'DROP FUNCTION IF EXISTS recipes_recipe_search_vector()',
+    'ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector',
+)
+
+SQLITE_FORWARD = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS recipes_recipe_fts USING fts5('
+    "name, text, content='recipes_recipe', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    *SQLITE_TRIGGERS.values(),
+    SQLITE_REBUILD,
+)
+SQLITE_BACKWARD = (
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_update',
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_delete',
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_insert',
+    'DROP TABLE IF EXISTS recipes_recipe_fts',
+)
+
+
+def run_for_vendor(postgresql, sqlite):
+    def operation(apps, schema_editor):
+        statements = {
+            'postgresql': postgresql,
+            'sqlite': sqlite,
+        }.get(schema_editor.connection.vendor, ())
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_feedentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor(POSTGRESQL_FORWARD, SQLITE_FORWARD),
+            run_for_vendor(POSTGRESQL_BACKWARD, SQLITE_BACKWARD),
+        ),
+    ]
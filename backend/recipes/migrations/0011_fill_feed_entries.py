@@ -0,0 +1,42 @@
+# Generated by Django 3.2.18 on 2026-10-18 21:05
+
+from django.db import migrations
+
+FEED_FANOUT_MAX_FOLLOWERS = 1000
+FEED_BACKFILL_SIZE = 50
+FEED_BATCH_SIZE = 1000
+
+
+def fill_feed_entries(apps, schema_editor):
+    subscribe = apps.get_model('users', 'Subscribe')
+    recipe = apps.get_model('recipes', 'Recipe')
+    feed_entry = apps.get_model('recipes', 'FeedEntry')
+    followers = {}
+    for user_id, author_id in subscribe.objects.filter(
+        author__followers_count__lte=FEED_FANOUT_MAX_FOLLOWERS
+    ).values_list('user_id', 'author_id').iterator():
+        followers.setdefault(author_id, []).append(user_id)
+    for author_id, user_ids in followers.items():
+        recipes = list(recipe.objects.filter(
+            author_id=author_id
+        ).order_by('-pub_date', '-id').values_list(
+            'id', 'pub_date')[:FEED_BACKFILL_SIZE])
+        feed_entry.objects.bulk_create(
+            (feed_entry(user_id=user_id, recipe_id=recipe_id,
+                        author_id=author_id, pub_date=pub_date)
+             for user_id in user_ids for recipe_id, pub_date in recipes),
+            batch_size=FEED_BATCH_SIZE,
+            ignore_conflicts=True
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_counters'),
+        ('recipes', '0010_similarrecipe'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_feed_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.18 on 2026-10-18 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_fill_feed_entries'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeChange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe_id', models.PositiveIntegerField(null=True, verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Изменение рецепта',
+                'verbose_name_plural': 'Изменения рецептов',
+            },
+        ),
+    ]
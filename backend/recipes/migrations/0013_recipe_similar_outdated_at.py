@@ -0,0 +1,38 @@
+# Generated by Django 3.2.18 on 2026-10-18 22:10
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def keep_built_recipes(apps, schema_editor):
+    recipe = apps.get_model('recipes', 'Recipe')
+    recipe.objects.filter(similar_outdated=False).update(
+        similar_outdated_at=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_recipechange'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='similar_outdated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, null=True, verbose_name='Похожие рецепты требуют пересчёта с'),
+        ),
+        migrations.RunPython(keep_built_recipes, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='recipe',
+            name='recipe_similar_outdated_idx',
+        ),
+        migrations.RemoveField(
+            model_name='recipe',
+            name='similar_outdated',
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('similar_outdated_at__isnull', False)), fields=['id'], name='recipe_similar_outdated_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+class CounterFieldsMixin:
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+    def refresh_from_db(self, using=None, fields=None):
+        if fields is not None and set(fields) & set(self.counter_fields):
+            fields = set(fields) | (
+                set(self.counter_fields) & self.get_deferred_fields())
+        super().refresh_from_db(using, fields)
@@ -1,11 +1,16 @@
+from django.conf import settings
 from django.core.validators import (MaxValueValidator,
                                     MinValueValidator,
                                     RegexValidator
                                     )
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
 
 from recipes import constants
-from users.models import User
+from recipes.mixins import CounterFieldsMixin
+from users.models import Subscribe, User
 
 
 class Tag(models.Model):
@@ -17,6 +22,7 @@ class Tag(models.Model):
     slug = models.SlugField(
         verbose_name='Слаг',
         max_length=constants.LENGTH_OF_FIELDS_RECIPES,
+        unique=True
     )
     color = models.CharField(
         'HEX',
@@ -29,6 +35,11 @@ class Tag(models.Model):
             )
         ]
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+        db_index=True
+    )
 
     class Meta:
         verbose_name = 'Тег'
@@ -47,6 +58,11 @@ class Ingredient(models.Model):
         'Единицы измерения',
         max_length=constants.LENGTH_OF_FIELDS_RECIPES
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+        db_index=True
+    )
 
     class Meta():
         verbose_name = 'Ингридиенты'
@@ -62,7 +78,26 @@ class Ingredient(models.Model):
         return f'{self.name}'
 
 
-class Recipe(models.Model):
+class RecipeManager(models.Manager):
+    def latest_by_author(self, author_ids, limit):
+        recipes = self.filter(author_id__in=author_ids)
+        if limit is None:
+            return recipes
+        sql, params = recipes.annotate(
+            row_number=Window(
+                expression=RowNumber(),
+                partition_by=F('author_id'),
+                order_by=(F('pub_date').desc(), F('id').desc())
+            )
+        ).query.sql_with_params()
+        return self.raw(
+            f'SELECT * FROM ({sql}) AS ranked WHERE row_number <= %s '
+            f'ORDER BY pub_date DESC, id DESC',
+            (*params, limit)
+        )
+
+
+class Recipe(CounterFieldsMixin, models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -99,11 +134,52 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True
     )
+    renditions = models.JSONField(
+        'Уменьшенные копии изображения',
+        default=dict,
+        blank=True,
+        editable=False
+    )
+    favorites_count = models.PositiveIntegerField(
+        'Количество добавлений в избранное',
+        default=0,
+        editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'Количество добавлений в список покупок',
+        default=0,
+        editable=False
+    )
+    similar_outdated_at = models.DateTimeField(
+        'Похожие рецепты требуют пересчёта с',
+        null=True,
+        default=timezone.now,
+        editable=False
+    )
+
+    objects = RecipeManager()
+
+    counter_fields = ('favorites_count', 'in_carts_count')
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date'),
+                name='recipe_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=('id',),
+                condition=models.Q(similar_outdated_at__isnull=False),
+                name='recipe_similar_outdated_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -179,3 +255,345 @@ class ShoppingCart(FavoriteShoppingCart):
         default_related_name = 'shopping_carts'
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
+
+
+class ShoppingListItemManager(models.Manager):
+    def add_recipe(self, user_id, recipe_id):
+        self.apply_recipe_change(recipe_id, {}, self._amounts(recipe_id),
+                                 user_ids=[user_id])
+
+    def remove_recipe(self, user_id, recipe_id):
+        self.apply_recipe_change(recipe_id, self._amounts(recipe_id), {},
+                                 user_ids=[user_id])
+
+    def add_recipes(self, user_id, recipe_ids):
+        self.apply(self._recipes_deltas(user_id, recipe_ids, 1))
+
+    def remove_recipes(self, user_id, recipe_ids):
+        self.apply(self._recipes_deltas(user_id, recipe_ids, -1))
+
+    def apply_recipe_change(self, recipe_id, old, new, user_ids=None):
+        changes = {}
+        for ingredient_id in old.keys() | new.keys():
+            delta = new.get(ingredient_id, 0) - old.get(ingredient_id, 0)
+            if delta:
+                changes[ingredient_id] = delta
+        if not changes:
+            return
+        if user_ids is None:
+            user_ids = ShoppingCart.objects.filter(
+                recipe_id=recipe_id).values_list('user_id', flat=True)
+        self.apply({
+            (user_id, ingredient_id): delta
+            for user_id in user_ids
+            for ingredient_id, delta in changes.items()
+        })
+
+    @transaction.atomic
+    def apply(self, deltas):
+        if not deltas:
+            return
+        user_ids = {user_id for user_id, _ in deltas}
+        list(User.objects.select_for_update().filter(
+            pk__in=user_ids).order_by('pk').values_list('pk'))
+        existing = {
+            (item.user_id, item.ingredient_id): item
+            for item in self.filter(
+                user_id__in=user_ids,
+                ingredient_id__in={key[1] for key in deltas}
+            )
+        }
+        to_create, to_update, to_delete = [], [], []
+        for (user_id, ingredient_id), delta in deltas.items():
+            item = existing.get((user_id, ingredient_id))
+            if item is None:
+                if delta > 0:
+                    to_create.append(self.model(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        total_amount=delta
+                    ))
+                continue
+            item.total_amount += delta
+            if item.total_amount > 0:
+                to_update.append(item)
+            else:
+                to_delete.append(item.pk)
+        self.bulk_create(to_create)
+        self.bulk_update(to_update, ('total_amount',))
+        self.filter(pk__in=to_delete).delete()
+
+    def expected(self, user_ids=None):
+        queryset = IngredientInRecipe.objects.all()
+        if user_ids is not None:
+            queryset = queryset.filter(
+                recipe__shopping_carts__user_id__in=user_ids)
+        return {
+            (row['user_id'], row['ingredient_id']): row['total_amount']
+            for row in queryset.values(
+                'ingredient_id',
+                user_id=models.F('recipe__shopping_carts__user_id')
+            ).filter(user_id__isnull=False).annotate(
+                total_amount=models.Sum('amount')
+            ).order_by()
+        }
+
+    @transaction.atomic
+    def rebuild(self, user_ids=None):
+        queryset = self.all()
+        if user_ids is not None:
+            queryset = queryset.filter(user_id__in=user_ids)
+        queryset.delete()
+        self.bulk_create(
+            self.model(user_id=user_id, ingredient_id=ingredient_id,
+                       total_amount=total_amount)
+            for (user_id, ingredient_id), total_amount
+            in self.expected(user_ids).items()
+        )
+
+    @staticmethod
+    def _recipes_deltas(user_id, recipe_ids, sign):
+        deltas = {}
+        for ingredient_id, amount in IngredientInRecipe.objects.filter(
+                recipe_id__in=recipe_ids).values_list('ingredient_id', 'amount'):
+            key = (user_id, ingredient_id)
+            deltas[key] = deltas.get(key, 0) + sign * amount
+        return deltas
+
+    @staticmethod
+    def _amounts(recipe_id):
+        return dict(IngredientInRecipe.objects.filter(
+            recipe_id=recipe_id).values_list('ingredient_id', 'amount'))
+
+
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент'
+    )
+    total_amount = models.PositiveIntegerField('Количество')
+
+    objects = ShoppingListItemManager()
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Позиции списка покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_user_ingredient'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user} :: {self.ingredient}'
+
+
+class FeedEntryManager(models.Manager):
+    def pulled_authors(self, user_id):
+        return list(User.objects.filter(
+            author__user_id=user_id,
+            followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS
+        ).values_list('pk', flat=True))
+
+    def fan_out(self, recipe):
+        if User.objects.filter(
+                pk=recipe.author_id,
+                followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS
+        ).exists():
+            return
+        followers = Subscribe.objects.filter(
+            author_id=recipe.author_id).values_list('user_id', flat=True)
+        self.bulk_create(
+            (self.model(user_id=user_id, recipe_id=recipe.id,
+                        author_id=recipe.author_id, pub_date=recipe.pub_date)
+             for user_id in followers.iterator()),
+            batch_size=constants.FEED_BATCH_SIZE,
+            ignore_conflicts=True
+        )
+
+    def backfill(self, user_id, author_ids):
+        author_ids = set(author_ids) - set(self.pulled_authors(user_id))
+        if not author_ids:
+            return
+        self.bulk_create(
+            (self.model(user_id=user_id, recipe_id=recipe.id,
+                        author_id=recipe.author_id, pub_date=recipe.pub_date)
+             for recipe in Recipe.objects.latest_by_author(
+                 author_ids, constants.FEED_BACKFILL_SIZE)),
+            batch_size=constants.FEED_BATCH_SIZE,
+            ignore_conflicts=True
+        )
+
+    def remove_authors(self, user_id, author_ids):
+        self.filter(user_id=user_id, author_id__in=author_ids).delete()
+
+    def followers_decreased(self, author_ids):
+        for author_id in User.objects.filter(
+                pk__in=author_ids,
+                followers_count=settings.FEED_FANOUT_MAX_FOLLOWERS
+        ).values_list('pk', flat=True):
+            self.fill_followers(author_id)
+
+    def fill_followers(self, author_id):
+        recipes = list(Recipe.objects.filter(
+            author_id=author_id
+        ).order_by('-pub_date', '-id').values_list(
+            'id', 'pub_date')[:constants.FEED_BACKFILL_SIZE])
+        followers = Subscribe.objects.filter(
+            author_id=author_id).values_list('user_id', flat=True)
+        self.bulk_create(
+            (self.model(user_id=user_id, recipe_id=recipe_id,
+                        author_id=author_id, pub_date=pub_date)
+             for user_id in followers.iterator()
+             for recipe_id, pub_date in recipes),
+            batch_size=constants.FEED_BATCH_SIZE,
+            ignore_conflicts=True
+        )
+
+    @transaction.atomic
+    def rebuild(self, user_ids=None):
+        subscriptions = Subscribe.objects.order_by('user_id')
+        entries = self.all()
+        if user_ids is not None:
+            subscriptions = subscriptions.filter(user_id__in=user_ids)
+            entries = entries.filter(user_id__in=user_ids)
+        entries.delete()
+        authors = {}
+        for user_id, author_id in subscriptions.values_list(
+                'user_id', 'author_id').iterator():
+            authors.setdefault(user_id, []).append(author_id)
+        for user_id, author_ids in authors.items():
+            self.backfill(user_id, author_ids)
+
+    def page(self, user_id, after, limit):
+        entries = self.filter(user_id=user_id)
+        pulled_ids = self.pulled_authors(user_id)
+        pulled = Recipe.objects.filter(author_id__in=pulled_ids)
+        if after is not None:
+            pub_date, recipe_id = after
+            entries = entries.filter(
+                models.Q(pub_date__lt=pub_date)
+                | models.Q(pub_date=pub_date, recipe_id__lt=recipe_id))
+            pulled = pulled.filter(
+                models.Q(pub_date__lt=pub_date)
+                | models.Q(pub_date=pub_date, id__lt=recipe_id))
+        results = list(entries.order_by('-pub_date', '-recipe_id')[:limit])
+        if not pulled_ids:
+            return results
+        results.extend(
+            self.model(user_id=user_id, recipe_id=recipe_id,
+                       author_id=author_id, pub_date=pub_date)
+            for recipe_id, author_id, pub_date in pulled.order_by(
+                '-pub_date', '-id'
+            ).values_list('id', 'author_id', 'pub_date')[:limit]
+        )
+        unique = {entry.recipe_id: entry for entry in results}
+        return sorted(
+            unique.values(),
+            key=lambda entry: (entry.pub_date, entry.recipe_id),
+            reverse=True
+        )[:limit]
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Подписчик',
+        db_index=False
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    objects = FeedEntryManager()
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_user_recipe'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='feed_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=('user', 'author'),
+                name='feed_user_author_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user} :: {self.recipe}'
+
+
+class SimilarRecipe(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_recipes',
+        verbose_name='Рецепт',
+        db_index=False
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField('Сходство')
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('recipe', 'similar'),
+                name='unique_recipe_similar'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('recipe', '-score'),
+                name='similar_recipe_score_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} :: {self.similar}'
+
+
+class RecipeChange(models.Model):
+    recipe_id = models.PositiveIntegerField('Рецепт', null=True)
+
+    class Meta:
+        verbose_name = 'Изменение рецепта'
+        verbose_name_plural = 'Изменения рецептов'
+
+    def __str__(self):
+        return f'{self.id} :: {self.recipe_id}'
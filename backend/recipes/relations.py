@@ -0,0 +1,134 @@
+import sqlite3
+
+from django.db import connection, transaction
+
+from recipes.counters import COUNTERS, change_counters
+from recipes.models import FeedEntry, ShoppingCart, ShoppingListItem
+from users.models import Subscribe
+
+CREATED = 'created'
+EXISTS = 'exists'
+DELETED = 'deleted'
+NOT_FOUND = 'not_found'
+INVALID = 'invalid'
+
+
+def counter_for(model, field):
+    for target, counters in COUNTERS.items():
+        for name, source in counters.items():
+            if source == (model, field):
+                return target, name
+    return None
+
+
+def supports_returning():
+    if connection.vendor == 'postgresql':
+        return True
+    return (connection.vendor == 'sqlite'
+            and sqlite3.sqlite_version_info >= (3, 35))
+
+
+def columns(model, field):
+    quote = connection.ops.quote_name
+    return (
+        quote(model._meta.db_table),
+        quote(model._meta.get_field('user').column),
+        quote(model._meta.get_field(field).column),
+    )
+
+
+def insert_ignore(model, field, user_id, ids):
+    if not supports_returning():
+        existing = set(model.objects.filter(
+            user_id=user_id, **{f'{field}_id__in': ids}
+        ).values_list(f'{field}_id', flat=True))
+        model.objects.bulk_create(
+            (model(user_id=user_id, **{f'{field}_id': pk}) for pk in ids),
+            ignore_conflicts=True
+        )
+        return [pk for pk in ids if pk not in existing]
+    table, user_column, target_column = columns(model, field)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({user_column}, {target_column}) '
+            f'VALUES {", ".join(["(%s, %s)"] * len(ids))} '
+            f'ON CONFLICT DO NOTHING RETURNING {target_column}',
+            [value for pk in ids for value in (user_id, pk)]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def delete_returning(model, field, user_id, ids):
+    table, user_column, target_column = columns(model, field)
+    if not supports_returning():
+        deleted = list(model.objects.filter(
+            user_id=user_id, **{f'{field}_id__in': ids}
+        ).select_for_update().values_list(f'{field}_id', flat=True))
+        if deleted:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {table} WHERE {user_column} = %s AND '
+                    f'{target_column} IN ({", ".join(["%s"] * len(deleted))})',
+                    [user_id, *deleted]
+                )
+        return deleted
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {user_column} = %s '
+            f'AND {target_column} IN ({", ".join(["%s"] * len(ids))}) '
+            f'RETURNING {target_column}',
+            [user_id, *ids]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def after_change(model, field, user_id, changed, added):
+    if not changed:
+        return
+    counter = counter_for(model, field)
+    if counter is not None:
+        target, name = counter
+        change_counters(target, changed, name, 1 if added else -1)
+    if model is ShoppingCart:
+        if added:
+            ShoppingListItem.objects.add_recipes(user_id, changed)
+        else:
+            ShoppingListItem.objects.remove_recipes(user_id, changed)
+    if model is Subscribe:
+        if added:
+            FeedEntry.objects.backfill(user_id, changed)
+        else:
+            FeedEntry.objects.remove_authors(user_id, changed)
+            FeedEntry.objects.followers_decreased(changed)
+
+
+@transaction.atomic
+def add_relations(model, field, user_id, ids, valid_ids, invalid_ids=()):
+    ids = list(dict.fromkeys(ids))
+    candidates = [
+        pk for pk in ids if pk in valid_ids and pk not in invalid_ids]
+    created = (
+        set(insert_ignore(model, field, user_id, candidates))
+        if candidates else set()
+    )
+    after_change(model, field, user_id, created, added=True)
+    return [
+        {'id': pk, 'status': (
+            CREATED if pk in created
+            else INVALID if pk in invalid_ids
+            else EXISTS if pk in valid_ids
+            else NOT_FOUND)}
+        for pk in ids
+    ]
+
+
+@transaction.atomic
+def remove_relations(model, field, user_id, ids):
+    ids = list(dict.fromkeys(ids))
+    deleted = (
+        set(delete_returning(model, field, user_id, ids)) if ids else set())
+    after_change(model, field, user_id, deleted, added=False)
+    return [
+        {'id': pk, 'status': DELETED if pk in deleted else NOT_FOUND}
+        for pk in ids
+    ]
@@ -0,0 +1,48 @@
+from django.db import connections
+
+SQLITE_TABLE = 'recipes_recipe_fts'
+SQLITE_TRIGGERS = {
+    'recipes_recipe_fts_insert': (
+        'CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_insert '
+        'AFTER INSERT ON recipes_recipe BEGIN '
+        'INSERT INTO recipes_recipe_fts (rowid, name, text) '
+        'VALUES (new.id, new.name, new.text); END'
+    ),
+    'recipes_recipe_fts_delete': (
+        'CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_delete '
+        'AFTER DELETE ON recipes_recipe BEGIN '
+        'INSERT INTO recipes_recipe_fts (recipes_recipe_fts, rowid, name, '
+        "text) VALUES ('delete', old.id, old.name, old.text); END"
+    ),
+    'recipes_recipe_fts_update': (
+        'CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_update '
+        'AFTER UPDATE OF name, text ON recipes_recipe BEGIN '
+        'INSERT INTO recipes_recipe_fts (recipes_recipe_fts, rowid, name, '
+        "text) VALUES ('delete', old.id, old.name, old.text); "
+        'INSERT INTO recipes_recipe_fts (rowid, name, text) '
+        'VALUES (new.id, new.name, new.text); END'
+    ),
+}
+SQLITE_REBUILD = (
+    "INSERT INTO recipes_recipe_fts (recipes_recipe_fts) VALUES ('rebuild')")
+
+
+def ensure_sqlite_triggers(sender, using, **kwargs):
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT type, name FROM sqlite_master "
+            "WHERE name = %s OR (type = 'trigger' AND tbl_name = %s)",
+            [SQLITE_TABLE, 'recipes_recipe']
+        )
+        existing = {name for _, name in cursor.fetchall()}
+        if SQLITE_TABLE not in existing:
+            return
+        missing = set(SQLITE_TRIGGERS) - existing
+        if not missing:
+            return
+        for name in sorted(missing):
+            cursor.execute(SQLITE_TRIGGERS[name])
+        cursor.execute(SQLITE_REBUILD)
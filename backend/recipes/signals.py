@@ -0,0 +1,79 @@
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from recipes.counters import change_counter
+from recipes.images import schedule_renditions
+from recipes.models import (Favorite, IngredientInRecipe, Recipe,
+                            ShoppingCart, ShoppingListItem)
+from users.models import User
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_recipe_from_shopping_lists(sender, instance, **kwargs):
+    ShoppingListItem.objects.apply_recipe_change(
+        instance.id,
+        dict(instance.ingredient.values_list('ingredient_id', 'amount')),
+        {}
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_save, sender=Recipe)
+def build_recipe_renditions(sender, instance, **kwargs):
+    schedule_renditions(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Favorite)
+def increment_favorites_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, instance.recipe_id, 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def decrement_favorites_count(sender, instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, 'favorites_count', -1)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def increment_in_carts_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, instance.recipe_id, 'in_carts_count', 1)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def decrement_in_carts_count(sender, instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, 'in_carts_count', -1)
+
+
+def mark_similar_outdated(recipe_ids):
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        similar_outdated_at=timezone.now())
+
+
+@receiver((post_save, post_delete), sender=IngredientInRecipe)
+def ingredients_changed(sender, instance, **kwargs):
+    mark_similar_outdated([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            mark_similar_outdated([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        mark_similar_outdated(pk_set)
+    elif action == 'pre_clear':
+        mark_similar_outdated(
+            list(instance.recipe_set.values_list('pk', flat=True)))
@@ -0,0 +1,130 @@
+from functools import reduce
+from itertools import chain
+from operator import or_
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from scipy import sparse
+
+from recipes.models import IngredientInRecipe, Recipe, SimilarRecipe
+
+TAG_WEIGHT = 0.5
+CLEAR_BATCH_SIZE = 100
+
+
+def load_pairs(queryset, *fields):
+    return np.fromiter(
+        chain.from_iterable(
+            queryset.order_by().distinct().values_list(*fields).iterator()),
+        dtype=np.int64
+    ).reshape(-1, 2)
+
+
+def tfidf(rows, columns, shape, max_df):
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, columns)), shape=shape)
+    frequency = np.bincount(columns, minlength=shape[1])
+    idf = np.log((1 + shape[0]) / (1 + frequency)) + 1
+    idf[frequency > max_df * shape[0]] = 0
+    matrix = matrix @ sparse.diags(idf)
+    matrix.eliminate_zeros()
+    return matrix
+
+
+def build_matrix(max_df):
+    ingredients = load_pairs(
+        IngredientInRecipe.objects, 'recipe_id', 'ingredient_id')
+    tags = load_pairs(Recipe.tags.through.objects, 'recipe_id', 'tag_id')
+    recipe_ids = np.union1d(ingredients[:, 0], tags[:, 0])
+    blocks = []
+    for pairs, weight in ((ingredients, 1), (tags, TAG_WEIGHT)):
+        features, columns = np.unique(pairs[:, 1], return_inverse=True)
+        blocks.append(weight * tfidf(
+            np.searchsorted(recipe_ids, pairs[:, 0]), columns,
+            (len(recipe_ids), len(features)), max_df))
+    matrix = sparse.hstack(blocks, format='csr')
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1))).ravel()
+    norms[norms == 0] = 1
+    return recipe_ids, (sparse.diags(1 / norms) @ matrix).tocsr()
+
+
+def nearest(scores, row, exclude, count):
+    start, end = scores.indptr[row], scores.indptr[row + 1]
+    columns = scores.indices[start:end]
+    values = scores.data[start:end]
+    keep = (columns != exclude) & (values > 0)
+    columns, values = columns[keep], values[keep]
+    if len(values) > count:
+        top = np.argpartition(-values, count)[:count]
+        columns, values = columns[top], values[top]
+    order = np.lexsort((columns, -values))
+    return zip(columns[order].tolist(), values[order].tolist())
+
+
+def affected_recipes(all_ids, matrix, transposed, changed_ids, count,
+                     batch_size):
+    holders = SimilarRecipe.objects.filter(
+        similar_id__in=changed_ids.tolist()
+    ).values_list('recipe_id', flat=True)
+    found = changed_ids[np.isin(changed_ids, all_ids)]
+    best = np.zeros(len(all_ids))
+    for start in range(0, len(found), batch_size):
+        positions = np.searchsorted(all_ids, found[start:start + batch_size])
+        scores = matrix[positions] @ transposed
+        best = np.maximum(best, scores.max(axis=0).toarray().ravel())
+    lowest = np.zeros(len(all_ids))
+    stored = np.zeros(len(all_ids), dtype=np.int64)
+    for recipe_id, score, total in SimilarRecipe.objects.values_list(
+            'recipe_id').annotate(score=Min('score'), total=Count('id')
+                                  ).order_by().iterator():
+        position = np.searchsorted(all_ids, recipe_id)
+        if position < len(all_ids) and all_ids[position] == recipe_id:
+            lowest[position], stored[position] = score, total
+    closer = (best > 0) & ((stored < count) | (best > lowest))
+    return np.union1d(
+        all_ids[closer], np.fromiter(holders.iterator(), dtype=np.int64))
+
+
+def clear_outdated(outdated, recipe_ids):
+    recipe_ids = [pk for pk in recipe_ids if pk in outdated]
+    for start in range(0, len(recipe_ids), CLEAR_BATCH_SIZE):
+        Recipe.objects.filter(reduce(or_, (
+            Q(pk=pk, similar_outdated_at=outdated[pk])
+            for pk in recipe_ids[start:start + CLEAR_BATCH_SIZE]
+        ))).update(similar_outdated_at=None)
+
+
+def update_similar_recipes(full, count, batch_size, max_df):
+    outdated = dict(Recipe.objects.filter(
+        similar_outdated_at__isnull=False
+    ).values_list('id', 'similar_outdated_at'))
+    if not full and not outdated:
+        return 0
+    all_ids, matrix = build_matrix(max_df)
+    transposed = matrix.T.tocsr()
+    changed_ids = np.fromiter(outdated, dtype=np.int64)
+    if full:
+        recipe_ids = np.union1d(all_ids, changed_ids)
+    else:
+        recipe_ids = np.union1d(changed_ids, affected_recipes(
+            all_ids, matrix, transposed, changed_ids, count, batch_size))
+    processed = 0
+    for start in range(0, len(recipe_ids), batch_size):
+        batch = recipe_ids[start:start + batch_size]
+        found = batch[np.isin(batch, all_ids)]
+        positions = np.searchsorted(all_ids, found)
+        scores = (matrix[positions] @ transposed).tocsr()
+        rows = [
+            SimilarRecipe(recipe_id=recipe_id, similar_id=int(all_ids[column]),
+                          score=score)
+            for row, (recipe_id, position) in enumerate(
+                zip(found.tolist(), positions.tolist()))
+            for column, score in nearest(scores, row, position, count)
+        ]
+        with transaction.atomic():
+            SimilarRecipe.objects.filter(recipe_id__in=batch.tolist()).delete()
+            SimilarRecipe.objects.bulk_create(rows)
+            clear_outdated(outdated, batch.tolist())
+        processed += len(batch)
+    return processed
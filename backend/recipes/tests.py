@@ -0,0 +1,209 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from recipes import similarity
+from recipes.models import (Ingredient, IngredientInRecipe, Recipe,
+                            ShoppingCart, ShoppingListItem, Tag)
+from recipes.search import SQLITE_TRIGGERS, ensure_sqlite_triggers
+from users.models import User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class QueryPlanTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed_data', users=50, recipes=1200, favorites=25, carts=5,
+            subscriptions=5, seed=1, stdout=StringIO())
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def test_recipe_filters_use_indexes(self):
+        out = StringIO()
+        call_command('check_query_plans', stdout=out)
+        self.assertIn('Планы запросов в порядке', out.getvalue())
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Только для SQLite')
+class SqliteSearchTriggerTest(TestCase):
+    def triggers(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger'")
+            return {name for name, in cursor.fetchall()}
+
+    def matches(self, query):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT rowid FROM recipes_recipe_fts '
+                'WHERE recipes_recipe_fts MATCH %s', [query])
+            return [rowid for rowid, in cursor.fetchall()]
+
+    def test_triggers_survive_migrations(self):
+        self.assertLessEqual(set(SQLITE_TRIGGERS), self.triggers())
+
+    def test_missing_triggers_are_restored(self):
+        author = User.objects.create_user(
+            username='cook', email='cook@example.com', password='pass',
+            first_name='Повар', last_name='Тестовый')
+        with connection.cursor() as cursor:
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER {name}')
+        recipe = Recipe.objects.create(
+            author=author, name='Окрошка', text='Квас', cooking_time=20)
+        self.assertEqual(self.matches('Окрошка'), [])
+        ensure_sqlite_triggers(sender=None, using=DEFAULT_DB_ALIAS)
+        self.assertLessEqual(set(SQLITE_TRIGGERS), self.triggers())
+        self.assertEqual(self.matches('Окрошка'), [recipe.id])
+        recipe.name = 'Солянка'
+        recipe.save()
+        self.assertEqual(self.matches('Солянка'), [recipe.id])
+
+
+class SimilarRecipesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='baker', email='baker@example.com', password='pass',
+            first_name='Пекарь', last_name='Тестовый')
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Продукт {number}', measurement_unit='г')
+            for number in range(5)
+        ]
+        cls.first = cls.create_recipe(0, 1)
+        cls.second = cls.create_recipe(2, 3)
+
+    @classmethod
+    def create_recipe(cls, *numbers):
+        recipe = Recipe.objects.create(
+            author=cls.author, name='Пирог', text='Описание',
+            cooking_time=40)
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(recipe=recipe,
+                               ingredient=cls.ingredients[number], amount=1)
+            for number in numbers
+        )
+        return recipe
+
+    def build(self, *args):
+        call_command(
+            'build_similar_recipes', *args, max_df=1.0, stdout=StringIO())
+
+    def similar(self, recipe):
+        return list(recipe.similar_recipes.values_list(
+            'similar_id', flat=True))
+
+    def outdated(self):
+        return set(Recipe.objects.filter(
+            similar_outdated_at__isnull=False).values_list('id', flat=True))
+
+    def test_new_recipe_becomes_neighbour(self):
+        self.build('--all')
+        self.assertEqual(self.similar(self.first), [])
+        third = self.create_recipe(0, 1, 4)
+        self.build()
+        self.assertEqual(self.similar(third), [self.first.id])
+        self.assertEqual(self.similar(self.first), [third.id])
+        self.assertEqual(self.similar(self.second), [])
+        self.assertEqual(self.outdated(), set())
+
+    def test_ingredient_and_tag_edits_mark_outdated(self):
+        self.build('--all')
+        IngredientInRecipe.objects.create(
+            recipe=self.first, ingredient=self.ingredients[4], amount=1)
+        self.assertEqual(self.outdated(), {self.first.id})
+        self.build()
+        tag = Tag.objects.create(
+            name='Выпечка', slug='bakery', color='#ffffff')
+        self.second.tags.add(tag)
+        self.assertEqual(self.outdated(), {self.second.id})
+        self.build()
+        tag.recipe_set.clear()
+        self.assertEqual(self.outdated(), {self.second.id})
+
+    def test_edit_during_build_stays_outdated(self):
+        build_matrix = similarity.build_matrix
+
+        def edit_then_build(max_df):
+            Recipe.objects.filter(pk=self.first.pk).update(
+                similar_outdated_at=timezone.now())
+            return build_matrix(max_df)
+
+        with mock.patch.object(
+                similarity, 'build_matrix', edit_then_build):
+            self.build()
+        self.assertEqual(self.outdated(), {self.first.id})
+        self.build()
+        self.assertEqual(self.outdated(), set())
+
+
+class RecipeAdminTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass',
+            first_name='Админ', last_name='Тестовый')
+        cls.tag = Tag.objects.create(
+            name='Завтрак', slug='breakfast', color='#ffffff')
+        cls.flour, cls.milk, cls.eggs = (
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('Мука', 'Молоко', 'Яйца')
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.admin, name='Блины', text='Описание',
+            cooking_time=20, image='recipes/images/pancakes.png')
+        cls.recipe.tags.set([cls.tag])
+        cls.rows = [
+            IngredientInRecipe.objects.create(
+                recipe=cls.recipe, ingredient=ingredient, amount=amount)
+            for ingredient, amount in ((cls.flour, 10), (cls.milk, 5))
+        ]
+        ShoppingCart.objects.create(user=cls.admin, recipe=cls.recipe)
+        ShoppingListItem.objects.add_recipes(cls.admin.id, [cls.recipe.id])
+
+    def shopping_list(self):
+        return dict(ShoppingListItem.objects.filter(
+            user=self.admin).values_list('ingredient__name', 'total_amount'))
+
+    def test_inline_changes_update_shopping_lists(self):
+        self.client.force_login(self.admin)
+        flour, milk = self.rows
+        response = self.client.post(
+            f'/admin/recipes/recipe/{self.recipe.id}/change/', {
+                'author': self.admin.id,
+                'name': 'Блины',
+                'text': 'Описание',
+                'cooking_time': 20,
+                'tags': [self.tag.id],
+                'ingredient-TOTAL_FORMS': 3,
+                'ingredient-INITIAL_FORMS': 2,
+                'ingredient-MIN_NUM_FORMS': 1,
+                'ingredient-MAX_NUM_FORMS': 1000,
+                'ingredient-0-id': flour.id,
+                'ingredient-0-recipe': self.recipe.id,
+                'ingredient-0-ingredient': self.flour.id,
+                'ingredient-0-amount': 999,
+                'ingredient-1-id': milk.id,
+                'ingredient-1-recipe': self.recipe.id,
+                'ingredient-1-ingredient': self.milk.id,
+                'ingredient-1-amount': 5,
+                'ingredient-1-DELETE': 'on',
+                'ingredient-2-recipe': self.recipe.id,
+                'ingredient-2-ingredient': self.eggs.id,
+                'ingredient-2-amount': 3,
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.shopping_list(), {'Мука': 999, 'Яйца': 3})
@@ -10,22 +10,11 @@ class UserAdmin(BaseUserAdmin):
         'username',
         'email',
         'first_name',
-        'recipe_count',
-        'follower_count',
+        'recipes_count',
+        'followers_count',
     )
-
-    def recipe_count(self, obj):
-        return obj.recipe.count()
-
-    recipe_count.short_description = 'Количество рецептов'
-
     list_filter = ('username',)
 
-    def follower_count(self, obj):
-        return obj.author.count()
-
-    follower_count.short_description = 'Количество подписчиков'
-
 
 class SubscribeAdmin(admin.ModelAdmin):
     list_display = (
@@ -4,9 +4,10 @@ from django.db import models
 
 from api.validators import validate_real_name
 from recipes import constants
+from recipes.mixins import CounterFieldsMixin
 
 
-class User(AbstractUser):
+class User(CounterFieldsMixin, AbstractUser):
     username = models.CharField(
         'Логин',
         max_length=constants.LENGTH_OF_FIELDS_USER,
@@ -32,6 +33,18 @@ class User(AbstractUser):
         max_length=constants.LENGTH_OF_USER_EMAIL,
         unique=True
     )
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов',
+        default=0,
+        editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков',
+        default=0,
+        editable=False
+    )
+
+    counter_fields = ('recipes_count', 'followers_count')
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -0,0 +1,29 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.counters import change_counter
+from recipes.models import FeedEntry
+from users.models import Subscribe, User
+
+
+@receiver(post_save, sender=Subscribe)
+def increment_followers_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'followers_count', 1)
+
+
+@receiver(post_delete, sender=Subscribe)
+def decrement_followers_count(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, 'followers_count', -1)
+
+
+@receiver(post_save, sender=Subscribe)
+def backfill_feed(sender, instance, created, **kwargs):
+    if created:
+        FeedEntry.objects.backfill(instance.user_id, [instance.author_id])
+
+
+@receiver(post_delete, sender=Subscribe)
+def remove_author_from_feed(sender, instance, **kwargs):
+    FeedEntry.objects.remove_authors(instance.user_id, [instance.author_id])
+    FeedEntry.objects.followers_decreased([instance.author_id])